@@ -0,0 +1,78 @@
+from enum import Enum
+
+from card import Card, Hand, mask_of
+
+# A discard is one card up to every suit of a rank.
+MIN_DISCARD = 1
+MAX_DISCARD = 4
+
+
+class ActionKind(Enum):
+    DISCARD = "discard"
+    CALLOUT = "callout"
+
+
+class Action:
+    """
+    Something a player asked to do. `turn` is the room's turn counter the
+    action was decided on, so decisions made against an older state can be
+    recognised and dropped.
+    """
+
+    __slots__ = ("player", "kind", "cards", "turn")
+
+    def __init__(self, player, kind: ActionKind, cards: list[Card], turn: int) -> None:
+        self.player = player
+        self.kind = kind
+        self.cards = cards
+        self.turn = turn
+
+    def __repr__(self) -> str:
+        return f"Action({self.player.name}, {self.kind.value}, {self.cards}, turn={self.turn})"
+
+
+class InvalidAction(Exception):
+    """An action that would break the game's rules, sent back to the player as an error."""
+
+    def __init__(self, code: str, detail: str) -> None:
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+
+    def to_message(self) -> dict:
+        return {"type": "error", "code": self.code, "detail": self.detail}
+
+
+def check_count(count: int) -> None:
+    if not MIN_DISCARD <= count <= MAX_DISCARD:
+        raise InvalidAction("bad-count", f"discard {MIN_DISCARD} to {MAX_DISCARD} cards, not {count}")
+
+
+def parse_cards(strs) -> list[Card]:
+    """Cards named by a client, checking the count before parsing anything."""
+    if not isinstance(strs, list):
+        raise InvalidAction("bad-request", "discard must be a list of cards")
+    check_count(len(strs))
+    cards = []
+    for s in strs:
+        try:
+            cards.append(Card.from_str(s))
+        except (ValueError, IndexError, TypeError, AttributeError):
+            raise InvalidAction("unknown-card", f"{s!r} is not a card") from None
+    return cards
+
+
+def validate_discard(hand: Hand, cards: list[Card]) -> None:
+    """
+    Checks a discard against the hand it comes from using card bitmasks:
+    a repeated card collapses into one bit, and any bit outside the hand's
+    mask is a card the player doesn't hold.
+    """
+    check_count(len(cards))
+    mask = mask_of(cards)
+    if mask.bit_count() != len(cards):
+        raise InvalidAction("duplicate-card", "the same card was discarded twice")
+    missing = mask & ~hand.mask
+    if missing:
+        not_held = [card for card in cards if missing >> card.code & 1]
+        raise InvalidAction("not-held", f"not in hand: {', '.join(map(str, not_held))}")
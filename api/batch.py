@@ -0,0 +1,547 @@
+"""
+Vectorised Cheat engine for evaluating bot strategies. Plays many games at
+once as NumPy arrays, one action per game per step, with policies written
+as array functions over the whole batch. The rules are Cheat.dispatch's;
+--parity plays the same deals through both engines and checks their state
+agrees after every step.
+
+--bots takes a lineup, e.g. heuristic,random, filled round the seats. Mixed
+lineups play every deal once per rotation of the lineup round the table, and
+win rates per strategy are over all rotations, so neither seat order nor the
+deal favours one. --callers picks who gets the pile when several players
+would call cheat at once. Games still going after --max-turns are reported
+as unfinished, and a run where most of them are fails instead of reporting
+throughput.
+
+    python batch.py --games 100000 --players 4 --bots heuristic
+    python batch.py --games 100000 --bots heuristic,random --callers nearest
+    python batch.py --parity 500
+"""
+import argparse
+import asyncio
+import functools
+import time
+from typing import Callable
+
+import numpy as np
+
+from actions import Action, ActionKind
+from card import CARDS, RANKS
+from cheat import Cheat, Phase
+from player import Player
+from strategy import CALLOUT_THRESHOLD, HeuristicStrategy, claim_bluff_probability
+
+DECK_SIZE = len(CARDS)
+SUITS = DECK_SIZE // RANKS
+# Codes are suit-major, so a (..., 52) array of cards reshapes to
+# (..., suits, ranks) with rank r at index r - 1.
+# BLUFF_ORDER[r][v]: how late rank v + 1 comes round again when r + 1 is due.
+BLUFF_ORDER = ((np.arange(RANKS)[None, :] - np.arange(RANKS)[:, None]) % RANKS).astype(np.int8)
+# Indexed by rank: the rank due after it, and the index of the one before it.
+NEXT_RANK = np.array([0, *range(2, RANKS + 1), 1], dtype=np.int8)
+PREVIOUS_RANK_INDEX = np.array([0, *((rank - 2) % RANKS for rank in range(1, RANKS + 1))], dtype=np.intp)
+
+# Phase as small ints, in the order of cheat.Phase.
+OPENING, DISCARD_OR_CALLOUT, AFTER_CALLOUT, FINISHED = range(4)
+PHASES = {
+    Phase.OPENING: OPENING,
+    Phase.DISCARD_OR_CALLOUT: DISCARD_OR_CALLOUT,
+    Phase.AFTER_CALLOUT: AFTER_CALLOUT,
+    Phase.FINISHED: FINISHED,
+}
+
+
+class BatchCheat:
+    """
+    Games of Cheat as arrays. Hands are a
+    (games, players, 52) bool array and the pile a (games, 52) bool array;
+    a card is always in exactly one of them. Hand and pile sizes and how
+    many of each rank they hold are kept up to date alongside, so policies
+    and the rules rarely have to count over all 52 cards.
+    """
+
+    # Every per-game array, row b of each being game b.
+    FIELDS = (
+        "hands", "rank_counts", "sizes", "pile", "pile_ranks", "pile_size", "rank",
+        "current", "previous", "last_discard", "cheated", "phase", "turn", "winner", "lineup",
+    )
+
+    def __init__(self, hands: np.ndarray, arbiter: "Arbiter | None" = None, lineup: np.ndarray | None = None) -> None:
+        self.hands = np.array(hands, dtype=bool)
+        games, self.players, _ = self.hands.shape
+        # Settles who calls when several players would; see the arbiters below.
+        self.arbiter = arbiter if arbiter is not None else nearest_caller
+        # Which of a mixed lineup's policies plays each seat, see mixed().
+        self.lineup = np.zeros((games, self.players), dtype=np.int8) if lineup is None else np.asarray(lineup, dtype=np.int8)
+        self.rank_counts = self.hands.reshape(games, self.players, SUITS, RANKS).sum(axis=2, dtype=np.int8)
+        self.sizes = self.rank_counts.sum(axis=2, dtype=np.int16)
+        self.pile = np.zeros((games, DECK_SIZE), dtype=bool)
+        self.pile_ranks = np.zeros((games, RANKS), dtype=np.int8)
+        self.pile_size = np.zeros(games, dtype=np.int16)
+        self.rank = np.ones(games, dtype=np.int8)
+        self.current = np.zeros(games, dtype=np.intp)
+        # Seat of the last discard; kept rather than worked out from current
+        # because nearly every step needs it.
+        self.previous = np.full(games, self.players - 1, dtype=np.intp)
+        self.next_seat = np.roll(np.arange(self.players), -1)
+        self.last_discard = np.zeros((games, self.players), dtype=np.int8)
+        self.cheated = np.zeros((games, self.players), dtype=bool)
+        self.phase = np.full(games, OPENING, dtype=np.int8)
+        self.turn = np.zeros(games, dtype=np.int32)
+        self.winner = np.full(games, -1, dtype=np.intp)
+
+    @property
+    def games(self) -> int:
+        return len(self.hands)
+
+    @property
+    def rows(self) -> np.ndarray:
+        return np.arange(self.games)
+
+    def current_hands(self) -> np.ndarray:
+        return self.hands[self.rows, self.current]
+
+    def step(self, discard_policy: "Policy", callout_policy: "Policy", active: np.ndarray | None = None) -> None:
+        """
+        One action in every unfinished game, or in those of them set in
+        `active`: a callout if any player but the last to discard is willing
+        while one is allowed (the arbiter picks whose), otherwise the
+        current player's discard. The discard policy must pick one to four
+        cards from the current player's hand, as Cheat would reject anything
+        else.
+        """
+        live = self.winner < 0
+        if active is not None:
+            live &= active
+        willing = callout_policy(self)
+        willing[self.rows, self.previous] = False
+        callers = self.arbiter(self, willing)
+        calling = live & (self.phase == DISCARD_OR_CALLOUT) & (callers >= 0)
+        if calling.any():
+            self.callout(np.flatnonzero(calling), callers[calling])
+
+        discarding = live & ~calling
+        # A player who emptied their hand wins once the next discard goes down unchallenged.
+        self.check_winner(np.flatnonzero(discarding & (self.phase == DISCARD_OR_CALLOUT)))
+        discarding &= self.winner < 0
+        if discarding.any():
+            self.discard(discarding, discard_policy(self))
+
+    def discard(self, discarding: np.ndarray, cards: np.ndarray) -> None:
+        """
+        The current player's discard in every game set in `discarding`.
+        Nearly every game discards on a step, so this works on whole arrays
+        rather than picking the discarding rows out.
+        """
+        rows, current = self.rows, self.current
+        cards = cards & discarding[:, None]
+        by_rank = count_ranks(cards)
+        counts = cards.sum(axis=1, dtype=np.int16)
+        self.hands[rows, current] &= ~cards
+        self.rank_counts[rows, current] -= by_rank
+        self.sizes[rows, current] -= counts
+        self.pile |= cards
+        self.pile_ranks += by_rank
+        self.pile_size += counts
+        self.last_discard[rows, current] = np.where(discarding, counts, self.last_discard[rows, current])
+        # Cheated unless every card was of the rank due.
+        honest = by_rank[rows, self.rank - 1] == counts
+        self.cheated[rows, current] = np.where(discarding, ~honest, self.cheated[rows, current])
+        self.rank = np.where(discarding, NEXT_RANK[self.rank], self.rank)
+        self.previous = np.where(discarding, current, self.previous)
+        self.current = np.where(discarding, self.next_seat[current], current)
+        self.phase[discarding] = DISCARD_OR_CALLOUT
+        self.turn += discarding
+
+    def callout(self, games: np.ndarray, callers: np.ndarray) -> None:
+        previous = self.previous[games]
+        # A cheat picks up the pile, an honest discard sends it to the caller.
+        takers = np.where(self.cheated[games, previous], previous, callers)
+        self.hands[games, takers] |= self.pile[games]
+        self.rank_counts[games, takers] += self.pile_ranks[games]
+        self.sizes[games, takers] += self.pile_size[games]
+        self.pile[games] = False
+        self.pile_ranks[games] = 0
+        self.pile_size[games] = 0
+        self.rank[games] = 1
+        self.phase[games] = AFTER_CALLOUT
+        self.turn[games] += 1
+        self.check_winner(games)
+
+    def check_winner(self, games: np.ndarray) -> None:
+        previous = self.previous[games]
+        emptied = self.sizes[games, previous] == 0
+        self.winner[games[emptied]] = previous[emptied]
+        self.phase[games[emptied]] = FINISHED
+
+    def keep(self, games: np.ndarray) -> None:
+        """Drops every game but these, so finished games stop costing work."""
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name)[games])
+
+    def state(self, game: int) -> dict:
+        """One game's state in the terms Cheat.state() uses, for comparing the two."""
+        return {
+            "hands": [mask_of_row(hand) for hand in self.hands[game]],
+            "last-discard": self.last_discard[game].tolist(),
+            "cheated": self.cheated[game].tolist(),
+            "pile": mask_of_row(self.pile[game]),
+            "current_value": int(self.rank[game]),
+            "current_player_index": int(self.current[game]),
+            "phase": int(self.phase[game]),
+            "turn": int(self.turn[game]),
+            "winner": int(self.winner[game]),
+        }
+
+
+def count_ranks(cards: np.ndarray) -> np.ndarray:
+    """How many of each rank a (games, 52) array of cards holds, as (games, 13) int8."""
+    # Adding the suits up is several times faster than sum() over a 4-long axis.
+    by_suit = cards.view(np.int8).reshape(-1, SUITS, RANKS)
+    return by_suit[:, 0] + by_suit[:, 1] + by_suit[:, 2] + by_suit[:, 3]
+
+
+# Maps a batch to each game's choice: a (games, 52) bool array of cards for
+# discards, a (games, players) bool array of who would call cheat for callouts.
+Policy = Callable[[BatchCheat], np.ndarray]
+# Picks the caller from a batch's willing players: a (games,) array of seats,
+# -1 where nobody calls.
+Arbiter = Callable[[BatchCheat, np.ndarray], np.ndarray]
+
+
+def mask_of_row(row: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(row, bitorder="little").tobytes(), "little")
+
+
+def row_of_mask(mask: int) -> np.ndarray:
+    data = np.frombuffer(mask.to_bytes(DECK_SIZE // 8 + 1, "little"), dtype=np.uint8)
+    return np.unpackbits(data, bitorder="little")[:DECK_SIZE].astype(bool)
+
+
+def deal(games: int, players: int, rng: np.random.Generator) -> np.ndarray:
+    """Shuffled hands for a batch, split the way Cheat.create_hands splits a deck."""
+    hand_size = DECK_SIZE // players
+    seats = np.concatenate([np.repeat(np.arange(players), hand_size), np.arange(DECK_SIZE - hand_size * players)])
+    decks = rng.permuted(np.tile(np.arange(DECK_SIZE), (games, 1)), axis=1)
+    hands = np.zeros((games, players, DECK_SIZE), dtype=bool)
+    hands[np.arange(games)[:, None], seats, decks] = True
+    return hands
+
+
+# --- Arbiters ---
+
+def nearest_caller(game: BatchCheat, willing: np.ndarray) -> np.ndarray:
+    """The first willing player going round the table from the discarder."""
+    distance = (np.arange(game.players) - game.previous[:, None] - 1) % game.players
+    distance = np.where(willing, distance, game.players)
+    return np.where(willing.any(axis=1), distance.argmin(axis=1), -1)
+
+
+def random_caller(rng: np.random.Generator) -> Arbiter:
+    """Any one of the willing players, each as likely as the others."""
+
+    def arbiter(game: BatchCheat, willing: np.ndarray) -> np.ndarray:
+        keys = np.where(willing, rng.random(willing.shape, dtype=np.float32), -1)
+        return np.where(willing.any(axis=1), keys.argmax(axis=1), -1)
+
+    return arbiter
+
+
+def server_order(game: BatchCheat, willing: np.ndarray) -> np.ndarray:
+    """
+    What happens with local bots on the live server, for --parity. Bots
+    decide in seat order and the game loop takes the first action queued,
+    so a callout only lands from a seat before the current player's: anyone
+    after is beaten by the discard. This favours the last seats heavily, so
+    it isn't a fair rule for comparing strategies.
+    """
+    willing = willing & (np.arange(game.players) < game.current[:, None])
+    return np.where(willing.any(axis=1), willing.argmax(axis=1), -1)
+
+
+ARBITERS = {
+    "nearest": lambda rng: nearest_caller,
+    "random": random_caller,
+    "server": lambda rng: server_order,
+}
+
+
+# --- Policies ---
+
+def heuristic_discard(game: BatchCheat) -> np.ndarray:
+    """strategy.pick_discard for every game."""
+    rows = game.rows
+    due = game.rank.astype(np.intp) - 1
+    counts = game.rank_counts[rows, game.current]
+    hands = game.current_hands().reshape(-1, SUITS, RANKS)
+    chosen = np.zeros_like(hands)
+    # Every card of the rank due, if there are any.
+    honest = counts[rows, due] > 0
+    chosen[rows[honest], :, due[honest]] = hands[rows[honest], :, due[honest]]
+    # Otherwise one card of the held rank that comes round again last, the
+    # lowest suit of it as max() over a Hand would pick.
+    bluffing = rows[~honest]
+    order = np.where(counts[bluffing] > 0, BLUFF_ORDER[due[bluffing]], -1)
+    rank = order.argmax(axis=1)
+    suit = hands[bluffing, :, rank].argmax(axis=1)
+    chosen[bluffing, suit, rank] = True
+    return chosen.reshape(-1, DECK_SIZE)
+
+
+@functools.cache
+def callout_table() -> np.ndarray:
+    """
+    HeuristicStrategy's callout decision for every (claimed, held, hand size,
+    claimer's hand size), from the same function, so the two agree exactly.
+    """
+    table = np.zeros((SUITS + 1, SUITS + 1, DECK_SIZE + 1, DECK_SIZE + 1), dtype=bool)
+    for claimed in range(1, SUITS + 1):
+        for held in range(SUITS + 1):
+            # Whatever of the rank we don't hold is among the cards we can't see.
+            for hand_size in range(DECK_SIZE + 1 - (SUITS - held)):
+                for previous_cards in range(DECK_SIZE + 1 - hand_size):
+                    p = claim_bluff_probability(claimed, held, hand_size, previous_cards)
+                    table[claimed, held, hand_size, previous_cards] = p >= CALLOUT_THRESHOLD
+    return table
+
+
+def heuristic_callout(game: BatchCheat) -> np.ndarray:
+    """HeuristicStrategy.should_callout for every player of every game."""
+    rows, previous = game.rows, game.previous
+    claimed = game.last_discard[rows, previous].astype(np.intp)
+    held = game.rank_counts[rows, :, PREVIOUS_RANK_INDEX[game.rank]]
+    sizes = game.sizes
+    # One flat lookup is much cheaper than indexing four axes.
+    table = callout_table()
+    _, held_axis, size_axis, previous_axis = table.shape
+    index = ((claimed[:, None] * held_axis + held) * size_axis + sizes) * previous_axis + sizes[rows, previous][:, None]
+    return table.ravel()[index]
+
+
+def random_discard(rng: np.random.Generator) -> Policy:
+    """
+    One to four cards in a row (in card order) from a random point in the
+    hand. Not the uniform sample simulate.RandomStrategy takes, which would
+    need a random key per card and is several times slower.
+    """
+
+    def policy(game: BatchCheat) -> np.ndarray:
+        hands = game.current_hands()
+        sizes = game.sizes[game.rows, game.current]
+        start = np.minimum((rng.random(game.games, dtype=np.float32) * sizes).astype(np.int16), sizes - 1)
+        counts = rng.integers(1, SUITS + 1, size=game.games, dtype=np.int16)
+        held_before = np.cumsum(hands, axis=1, dtype=np.int8)
+        return hands & (held_before > start[:, None]) & (held_before <= (start + counts)[:, None])
+
+    return policy
+
+
+def random_callout(rng: np.random.Generator, rate: float = 0.1) -> Policy:
+    """Each player would call cheat with probability `rate`."""
+
+    def policy(game: BatchCheat) -> np.ndarray:
+        return rng.random((game.games, game.players)) < rate
+
+    return policy
+
+
+def mixed(discard_policies: list[Policy], callout_policies: list[Policy]) -> tuple[Policy, Policy]:
+    """Policies that play each seat with the one game.lineup names for it."""
+    if len(discard_policies) == 1:
+        return discard_policies[0], callout_policies[0]
+
+    def discard(game: BatchCheat) -> np.ndarray:
+        playing = game.lineup[game.rows, game.current]
+        cards = np.zeros((game.games, DECK_SIZE), dtype=bool)
+        for index, policy in enumerate(discard_policies):
+            mine = playing == index
+            cards[mine] = policy(game)[mine]
+        return cards
+
+    def callout(game: BatchCheat) -> np.ndarray:
+        willing = np.zeros((game.games, game.players), dtype=bool)
+        for index, policy in enumerate(callout_policies):
+            mine = game.lineup == index
+            willing[mine] = policy(game)[mine]
+        return willing
+
+    return discard, callout
+
+
+# --- Running ---
+
+def play(game: BatchCheat, discard_policy: Policy, callout_policy: Policy, max_turns: int) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Steps every game until it is won or reaches max_turns discards and
+    callouts. Returns each game's winner (-1 if unfinished), its turns, and
+    the steps taken.
+    """
+    winners = np.full(game.games, -1, dtype=np.intp)
+    turns = np.zeros(game.games, dtype=np.int32)
+    ids = np.arange(game.games)
+    steps = 0
+    while game.games:
+        game.step(discard_policy, callout_policy, game.turn < max_turns)
+        steps += 1
+        done = (game.winner >= 0) | (game.turn >= max_turns)
+        # Compacting copies every array, so wait until it sheds a good share of rows.
+        if done.all() or done.sum() * 4 >= game.games:
+            winners[ids[done]] = game.winner[done]
+            turns[ids[done]] = game.turn[done]
+            keep = np.flatnonzero(~done)
+            game.keep(keep)
+            ids = ids[keep]
+    return winners, turns, steps
+
+
+def policies(kind: str, rng: np.random.Generator) -> tuple[Policy, Policy]:
+    if kind == "heuristic":
+        return heuristic_discard, heuristic_callout
+    return random_discard(rng), random_callout(rng)
+
+
+def rotations(hands: np.ndarray, seats: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every deal once per rotation of the lineup round the table: the hands
+    repeated, and which policy sits in each seat of each copy.
+    """
+    deals, players = len(hands), len(seats)
+    shift = np.tile(np.arange(players), deals)
+    lineup = seats[(np.arange(players)[None, :] + shift[:, None]) % players]
+    return np.repeat(hands, players, axis=0), lineup
+
+
+def run(games: int, players: int, kinds: list[str], callers: str, seed: int, max_turns: int) -> None:
+    rng = np.random.default_rng(seed)
+    names = list(dict.fromkeys(kinds))
+    discard_policy, callout_policy = mixed(*zip(*(policies(kind, rng) for kind in names)))
+    if "heuristic" in names:
+        callout_table()  # built once, outside the timing
+    seats = np.array([names.index(kinds[seat % len(kinds)]) for seat in range(players)], dtype=np.int8)
+    if len(names) > 1:
+        # Rotating a single strategy round the table would replay the same games.
+        hands, lineup = rotations(deal(-(-games // players), players, rng), seats)
+    else:
+        hands, lineup = deal(games, players, rng), None
+    games = len(hands)
+    game = BatchCheat(hands, ARBITERS[callers](rng), lineup)
+    seated = game.lineup.copy()
+
+    started = time.perf_counter()
+    winners, turns, steps = play(game, discard_policy, callout_policy, max_turns)
+    elapsed = time.perf_counter() - started
+
+    unfinished = int((winners < 0).sum())
+    if unfinished * 2 > games:
+        # Turns/s over games that never end says nothing about the policies.
+        raise SystemExit(
+            f"{unfinished} of {games} games hit the {max_turns} turn limit: "
+            f"these policies don't finish games under --callers {callers}"
+        )
+    total = int(turns.sum())
+    print(f"unfinished: {unfinished} of {games} games hit the {max_turns} turn limit")
+    print(f"{games} games, {total} turns in {steps} steps, {elapsed:.2f}s")
+    print(f"{(games - unfinished) / elapsed:,.0f} finished games/s, {total / elapsed:,.0f} turns/s")
+    won = winners >= 0
+    wins = np.bincount(winners[won], minlength=players)
+    print("wins by seat: " + ", ".join(f"{seat}: {count}" for seat, count in enumerate(wins)))
+    if len(names) > 1:
+        # Per seat held, so lineups with more of one strategy compare fairly.
+        winning = seated[np.flatnonzero(won), winners[won]]
+        held = np.bincount(seats, minlength=len(names))
+        rates = np.bincount(winning, minlength=len(names)) / max(1, int(won.sum())) / held
+        print(
+            "win rate per seat over every rotation: "
+            + ", ".join(f"{name} {rate:.1%}" for name, rate in zip(names, rates))
+            + f" ({1 / players:.1%} is even)"
+        )
+
+
+# --- Parity with Cheat ---
+
+class ParityMismatch(Exception):
+    pass
+
+
+def room_state(room: Cheat) -> dict:
+    """Cheat's state in the terms BatchCheat.state() uses."""
+    return {
+        "hands": [player.hand.mask for player in room.players],
+        "last-discard": [len(player.last_discard) for player in room.players],
+        "cheated": [player.cheated for player in room.players],
+        "pile": sum(1 << card.code for card in room.deck),
+        "current_value": room.current_value,
+        "current_player_index": room.current_player_index,
+        "phase": PHASES[room.phase],
+        "turn": room.turn,
+        "winner": room.players.index(room.winner) if room.winner is not None else -1,
+    }
+
+
+async def play_step(room: Cheat, strategy: HeuristicStrategy) -> None:
+    """The action BatchCheat.step takes with the heuristic policies, through Cheat.dispatch."""
+    players = room.players
+    if room.phase is Phase.DISCARD_OR_CALLOUT:
+        for player in players[:room.current_player_index]:
+            if player is room.previous_player:
+                continue
+            if await strategy.should_callout(room.pov_data(player)):
+                await room.dispatch(Action(player, ActionKind.CALLOUT, [], room.turn))
+                return
+    player = room.current_player
+    cards = await strategy.choose_discard(list(player.hand), room.pov_data(player))
+    await room.dispatch(Action(player, ActionKind.DISCARD, cards, room.turn))
+
+
+async def check_parity(games: int, players: int, seed: int, max_turns: int) -> int:
+    """
+    Deals `games` games with Cheat, plays them with the heuristic in both
+    engines and compares every game's state after each step. Returns the
+    number of steps checked; raises ParityMismatch on the first difference.
+    """
+    rooms = []
+    for index in range(games):
+        room = Cheat(f"parity{index}", bot_count=0)
+        for seat in range(players):
+            room.join(Player(f"p{seat}"))
+        room.deal(seed + index)
+        rooms.append(room)
+    game = BatchCheat([[row_of_mask(player.hand.mask) for player in room.players] for room in rooms], server_order)
+    strategy = HeuristicStrategy()
+
+    steps = 0
+    while any(room.winner is None and room.turn < max_turns for room in rooms):
+        game.step(heuristic_discard, heuristic_callout, game.turn < max_turns)
+        steps += 1
+        for index, room in enumerate(rooms):
+            if room.winner is None and room.turn < max_turns:
+                await play_step(room, strategy)
+            expected, actual = room_state(room), game.state(index)
+            if expected != actual:
+                differences = {key: (expected[key], actual[key]) for key in expected if expected[key] != actual[key]}
+                raise ParityMismatch(f"game {index} differs after step {steps}: {differences}")
+    return steps
+
+
+def parity(games: int, players: int, seed: int, max_turns: int) -> None:
+    started = time.perf_counter()
+    steps = asyncio.run(check_parity(games, players, seed, max_turns))
+    print(f"{games} games agree with Cheat over {steps} steps ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--bots", type=lambda s: s.split(","), default=["heuristic"], help="lineup, e.g. heuristic,random")
+    parser.add_argument("--callers", choices=tuple(ARBITERS), default="random", help="who calls when several would")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=1000)
+    parser.add_argument("--parity", type=int, metavar="GAMES", help="check this many games against Cheat instead")
+    args = parser.parse_args()
+    if not set(args.bots) <= {"random", "heuristic"}:
+        parser.error("--bots takes random and heuristic")
+    if args.parity is not None:
+        parity(args.parity, args.players, args.seed, args.max_turns)
+    else:
+        run(args.games, args.players, args.bots, args.callers, args.seed, args.max_turns)
@@ -0,0 +1,69 @@
+"""
+Microbenchmark of the interned Card / bitmask Hand against the original
+string-keyed Card class, over the operations the game does every turn.
+
+    python bench_card.py [iterations]
+"""
+import random
+import sys
+import timeit
+from typing import Any
+
+from card import CARDS, Hand, Suit
+
+
+class LegacyCard:
+    def __init__(self, suit: Suit, value: int) -> None:
+        self.suit = suit
+        self.value = value
+
+    def __str__(self) -> str:
+        return f"{self.suit.value}{self.value}"
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __eq__(self, other: Any) -> bool:
+        return str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+
+def run(iterations: int) -> None:
+    rng = random.Random(0)
+    codes = rng.sample(range(52), 17)
+    discard_codes = codes[:3]
+
+    legacy_hand = [LegacyCard(CARDS[c].suit, CARDS[c].value) for c in codes]
+    legacy_discard = [LegacyCard(CARDS[c].suit, CARDS[c].value) for c in discard_codes]
+    legacy_probe = LegacyCard(CARDS[codes[-1]].suit, CARDS[codes[-1]].value)
+
+    hand = Hand(CARDS[c] for c in codes)
+    discard = [CARDS[c] for c in discard_codes]
+    probe = CARDS[codes[-1]]
+
+    cases = {
+        "discard (set difference)": (
+            lambda: list(set(legacy_hand) - set(legacy_discard)),
+            lambda: hand.copy().remove_all(discard),
+        ),
+        "membership": (
+            lambda: legacy_probe in legacy_hand,
+            lambda: probe in hand,
+        ),
+        "serialize hand": (
+            lambda: list(map(lambda c: str(c), legacy_hand)),
+            lambda: hand.to_strs(),
+        ),
+    }
+
+    print(f"{'operation':<26}{'legacy us':>12}{'compact us':>12}{'speedup':>10}")
+    for name, (legacy, compact) in cases.items():
+        legacy_us = timeit.timeit(legacy, number=iterations) / iterations * 1e6
+        compact_us = timeit.timeit(compact, number=iterations) / iterations * 1e6
+        print(f"{name:<26}{legacy_us:>12.3f}{compact_us:>12.3f}{legacy_us / compact_us:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
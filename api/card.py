@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Any
+from typing import Iterable, Iterator
 
 
 class Suit(Enum):
@@ -9,29 +9,142 @@ class Suit(Enum):
     SPADES = "S"
 
 
+RANKS = 13
+SUITS = list(Suit)
+
+
 class Card:
-    def __init__(self, suit: Suit, value: int) -> None:
-        self.suit = suit
-        self.value = value
+    """
+    One of the 52 cards, identified by a small int code (suit-major, 0-51).
+    Cards are interned: Card(suit, value) always returns the same instance,
+    so equality and hashing are by identity and cost nothing.
+    """
+
+    __slots__ = ("suit", "value", "code", "_str")
+
+    def __new__(cls, suit: Suit, value: int) -> "Card":
+        if not 1 <= value <= RANKS:
+            raise ValueError(f"invalid card value {value}")
+        return CARDS[SUITS.index(suit) * RANKS + value - 1]
+
+    @staticmethod
+    def from_code(code: int) -> "Card":
+        return CARDS[code]
 
     @staticmethod
     def from_str(s: str) -> "Card":
+        card = CARDS_BY_STR.get(s)
+        if card is not None:
+            return card
         suit = Suit(s[0].upper())
         value = int(s[1:])
         return Card(suit, value)
 
     def __str__(self) -> str:
-        return f"{self.suit.value}{self.value}"
+        return self._str
 
     def __repr__(self) -> str:
-        return str(self)
+        return self._str
+
+    def __reduce__(self):
+        return Card.from_code, (self.code,)
+
+
+def _make_card(suit: Suit, value: int) -> Card:
+    card = object.__new__(Card)
+    card.suit = suit
+    card.value = value
+    card.code = SUITS.index(suit) * RANKS + value - 1
+    card._str = f"{suit.value}{value}"
+    return card
+
+
+CARDS: list[Card] = [_make_card(suit, value) for suit in Suit for value in range(1, RANKS + 1)]
+CARDS_BY_STR: dict[str, Card] = {str(card): card for card in CARDS}
+CARD_STRS: list[str] = [str(card) for card in CARDS]
+
+
+def mask_of(cards: Iterable[Card]) -> int:
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.code
+    return mask
+
+
+def codes_of(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Hand:
+    """
+    A set of cards held as a 52-bit mask. Membership, adding and removing
+    cards are single bit operations; iteration is in card code order.
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, cards: Iterable[Card] = ()) -> None:
+        self.mask = mask_of(cards)
+
+    @classmethod
+    def from_mask(cls, mask: int) -> "Hand":
+        hand = cls()
+        hand.mask = mask
+        return hand
+
+    def __len__(self) -> int:
+        return self.mask.bit_count()
+
+    def __iter__(self) -> Iterator[Card]:
+        return (CARDS[code] for code in codes_of(self.mask))
+
+    def __contains__(self, card: Card) -> bool:
+        return self.mask >> card.code & 1 == 1
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Hand) and self.mask == other.mask
+
+    def __repr__(self) -> str:
+        return f"Hand({self.to_strs()})"
+
+    def append(self, card: Card) -> None:
+        self.mask |= 1 << card.code
+
+    def extend(self, cards: Iterable[Card]) -> None:
+        self.mask |= mask_of(cards)
+
+    def remove_all(self, cards: Iterable[Card]) -> None:
+        self.mask &= ~mask_of(cards)
+
+    def __iadd__(self, cards: Iterable[Card]) -> "Hand":
+        self.extend(cards)
+        return self
+
+    def __isub__(self, cards: Iterable[Card]) -> "Hand":
+        self.remove_all(cards)
+        return self
+
+    def pop(self) -> Card:
+        if not self.mask:
+            raise IndexError("pop from empty hand")
+        code = self.mask.bit_length() - 1
+        self.mask ^= 1 << code
+        return CARDS[code]
+
+    def copy(self) -> "Hand":
+        hand = Hand()
+        hand.mask = self.mask
+        return hand
 
-    def __eq__(self, other: Any) -> bool:
-        return str(self) == str(other)
+    def clear(self) -> None:
+        self.mask = 0
 
-    def __hash__(self) -> int:
-        return hash(str(self))
+    def to_strs(self) -> list[str]:
+        return [CARD_STRS[code] for code in codes_of(self.mask)]
 
 
 def generate_deck() -> list[Card]:
-    return [Card(suit, value) for suit in Suit for value in range(1, 14)]
+    return list(CARDS)
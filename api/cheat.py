@@ -1,19 +1,67 @@
 import asyncio
 import json
+import os
 import random
+import time
+from enum import Enum
 from typing import Any
 
-from card import generate_deck, Card
+from actions import Action, ActionKind, InvalidAction, validate_discard
+from card import generate_deck, Card, Hand
+from delta import diff, snapshot
+from logs import get_logger
+from metrics import ACTION_SECONDS, BROADCAST_RECIPIENTS, BROADCAST_SECONDS, TURN_SECONDS
 from player import Player, HumanPlayer, BotPlayer
+from strategy import HeuristicStrategy
+from telemetry import telemetry
+
+# Seconds a disconnected player's turn waits before a bot plays it for them.
+TURN_TIMEOUT = float(os.getenv("CHEAT_TURN_TIMEOUT", "30"))
+# Discards between state snapshots in the event log, bounding recovery replay
+# to the events since the last one. Callouts in between don't count.
+SNAPSHOT_EVERY = int(os.getenv("CHEAT_SNAPSHOT_EVERY", "50"))
+
+
+class Phase(Enum):
+    LOBBY = "lobby"
+    # The very first discard of the game, nothing to call out yet.
+    OPENING = "opening"
+    # The current player may discard, anyone but the last discarder may call cheat.
+    DISCARD_OR_CALLOUT = "discard-or-callout"
+    # A callout was just resolved, only the current player's discard is accepted.
+    AFTER_CALLOUT = "after-callout"
+    FINISHED = "finished"
 
 
 class Cheat:
-    def __init__(self):
+    def __init__(self, room_id: str = "default", bot_count: int = 1):
+        self.id = room_id
+        self.log = get_logger("cheat.room", room=room_id)
+        self.bot_count = bot_count
+        self.created_at = time.monotonic()
+        self.last_activity = self.created_at
+        self.game_task: asyncio.Task | None = None
+        self.winner: Player | None = None
         self.playing = False
         self.current_player_index = 0
         self.players: list[Player] = []
         self.deck = generate_deck()
         self.current_value = 1
+        # Bumped on every state broadcast so clients can check deltas apply in order.
+        self.version = 0
+        self.phase = Phase.LOBBY
+        # Counts accepted discards and callouts; actions decided on an older turn are stale.
+        self.turn = 0
+        # Discards since the last event log snapshot (or the deal).
+        self.discards_since_snapshot = 0
+        # None is a wake-up: the loop re-checks who it is waiting on.
+        self.actions: asyncio.Queue[Action | None] = asyncio.Queue()
+        # Plays the turns of disconnected humans.
+        self.stand_in = HeuristicStrategy()
+        # Wall-clock start of the current turn, for lining speech up with discards.
+        self.turn_started_at = time.time()
+        # Where accepted actions are recorded, see eventlog.py. None keeps no log.
+        self.events = None
 
     @property
     def human_players(self) -> list[HumanPlayer]:
@@ -23,17 +71,97 @@ class Cheat:
     def bot_players(self) -> list[BotPlayer]:
         return list(filter(lambda player: isinstance(player, BotPlayer), self.players))
 
+    def record(self, event: dict) -> None:
+        if self.events is not None:
+            self.events.append(event)
+
     def join(self, player: Player):
+        player.room = self
         self.players.append(player)
+        if isinstance(player, HumanPlayer):
+            self.record({"e": "join", "name": player.name, "secret-hash": player.secret_hash})
+        else:
+            self.record({"e": "join", "name": player.name, "bot": True})
+            if isinstance(player, BotPlayer):
+                player.strategy.bind(self.id)
+        self.touch()
+
+    def ready_up(self, player: HumanPlayer) -> None:
+        player.ready_up()
+        self.record({"e": "ready", "player": self.players.index(player)})
+
+    def leave(self, player: HumanPlayer):
+        # Seats can only be given up before dealing, mid-game the player stays
+        # in the rotation (a bot covers their turns) until they reconnect or
+        # the room is reaped once every human is gone.
+        if player.connected:
+            pass  # a newer connection has already taken the seat over
+        elif not self.playing and player in self.players:
+            self.record({"e": "leave", "player": self.players.index(player)})
+            self.players.remove(player)
+        else:
+            player.detach()
+            self.wake()
+        self.touch()
+
+    def find_session(self, session: str) -> HumanPlayer | None:
+        for player in self.human_players:
+            if player.owns_session(session):
+                return player
+        return None
+
+    async def resume(self, player: HumanPlayer, websocket, codec) -> None:
+        player.attach(websocket, codec)
+        self.touch()
+        self.wake()
+        if self.playing:
+            await self.send_pov(player)
+        elif self.winner is not None:
+            await player.send({"winner": self.winner.name})
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
 
     @property
     def all_ready(self):
         return len(self.players) != 0 and all(map(lambda p: p.ready, self.players))
 
+    @property
+    def joinable(self) -> bool:
+        return not self.playing and not self.all_ready
+
+    @property
+    def finished(self) -> bool:
+        return self.winner is not None or (self.game_task is not None and self.game_task.done())
+
+    def abandoned(self, now: float, grace: float) -> bool:
+        humans = self.human_players
+        if any(p.connected for p in humans):
+            return False
+        # Give the last player to drop the same grace to reconnect.
+        last_seen = max((p.disconnected_at for p in humans), default=self.created_at)
+        return now - max(self.created_at, last_seen) >= grace
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "players": [p.name for p in self.players],
+            "playing": self.playing,
+            "joinable": self.joinable,
+            "finished": self.finished,
+        }
+
     async def broadcast(self, message: Any):
+        self.log.debug("broadcast", fields={"message": message})
+        # Encoded once per format rather than once per player.
+        frames = {}
         for player in self.human_players:
-            print(message)
-            await player.websocket.send_json(message)
+            if player.codec not in frames:
+                frames[player.codec] = player.codec.encode(message)
+        await asyncio.gather(
+            *(player.send_frame(frames[player.codec]) for player in self.human_players),
+            return_exceptions=True,
+        )
 
     @property
     def current_player(self):
@@ -58,10 +186,9 @@ class Cheat:
         else:
             self.current_value += 1
 
-    def pov_data(self, player: Player):
+    def shared_pov(self) -> dict:
+        """The part of every player's pov that is the same for the whole room."""
         return {
-            "name": player.name,
-            "hand": list(map(lambda c: str(c), player.hand)),
             "stack-size": len(self.deck),
             "player_info": [
                 {
@@ -69,16 +196,80 @@ class Cheat:
                     "cards": len(p.hand),
                     "last-discard": len(p.last_discard),
                 }
-                for p in list(filter(lambda _p: _p.name != player.name, self.players))
+                for p in self.players
             ],
             "waiting-for": self.current_player.name,
-            "own-turn": self.current_player.name == player.name,
+            "previous-player": self.previous_player.name,
+            "callout-open": self.phase is Phase.DISCARD_OR_CALLOUT,
+        }
+
+    def pov_data(self, player: Player, with_hand: bool = True, shared: dict | None = None):
+        # Broadcasts build `shared` once and pass it in for every player.
+        if shared is None:
+            shared = self.shared_pov()
+        return {
+            "name": player.name,
+            "hand": player.hand.to_strs() if with_hand else None,
+            "stack-size": shared["stack-size"],
+            "player_info": [info for info in shared["player_info"] if info["name"] != player.name],
+            "waiting-for": shared["waiting-for"],
+            "previous-player": shared["previous-player"],
+            "own-turn": shared["waiting-for"] == player.name,
+            "can-callout": shared["callout-open"] and shared["previous-player"] != player.name,
             "current_rank": self.current_value,
         }
 
+    def submit(self, action: Action) -> None:
+        self.actions.put_nowait(action)
+
+    def wake(self) -> None:
+        self.actions.put_nowait(None)
+
+    def turn_timeout(self) -> float | None:
+        """
+        How much longer to wait for the current player before playing for
+        them. The deadline runs from the start of the turn, so other actions
+        arriving in the meantime don't push it back.
+        """
+        player = self.current_player
+        if isinstance(player, HumanPlayer) and not player.connected:
+            return max(0.0, self.turn_started_at + TURN_TIMEOUT - time.time())
+        return None
+
+    async def play_for(self, player: HumanPlayer) -> None:
+        self.log.info("playing turn for away player", fields={"player": player.name})
+        cards = await self.stand_in.choose_discard(player.hand, self.pov_data(player))
+        await self.dispatch(Action(player, ActionKind.DISCARD, cards, self.turn))
+
     async def discard(self, discard_list: list[Card]) -> None:
-        self.current_player.hand = list(set(self.current_player.hand) - set(discard_list))
-        print(f"{self.current_player.name} discarded {len(discard_list)} cards")
+        self.touch()
+        now = time.time()
+        kind = "human" if isinstance(self.current_player, HumanPlayer) else "bot"
+        TURN_SECONDS.labels(kind).observe(now - self.turn_started_at)
+        telemetry.mark_turn(self.id, self.current_player.name, self.turn_started_at, now)
+        self.turn_started_at = now
+        self.apply_discard(discard_list)
+        self.record({"e": "discard", "cards": [card.code for card in discard_list]})
+        if self.events is not None and self.discards_since_snapshot >= SNAPSHOT_EVERY:
+            self.record({"e": "snapshot", "state": self.state()})
+            self.discards_since_snapshot = 0
+        await self.broadcast_povs()
+
+    async def callout(self, caller: Player) -> None:
+        self.touch()
+        self.log.debug("callout", fields={"caller": caller.name, "accused": self.previous_player.name})
+        self.record({"e": "callout", "player": self.players.index(caller)})
+        self.apply_callout(caller)
+        await self.broadcast_povs()
+
+    # State changes only, shared by the live game and event log replay.
+
+    def apply_discard(self, discard_list: list[Card]) -> None:
+        self.turn += 1
+        self.discards_since_snapshot += 1
+        self.current_player.hand -= discard_list
+        self.current_player.last_discard = discard_list
+        self.log.debug("discard", fields={"player": self.current_player.name, "cards": len(discard_list)})
         self.deck += discard_list
         self.current_player.cheated = False
         for card in discard_list:
@@ -87,31 +278,92 @@ class Cheat:
                 break
         self.increment_current_value()
         self.increment_player()
-        await self.broadcast_povs()
+        self.phase = Phase.DISCARD_OR_CALLOUT
 
-    async def callout(self, caller: Player) -> None:
-        print(f"{caller.name} called {self.previous_player.name} a cheat")
+    def apply_callout(self, caller: Player) -> None:
+        # A discard queued before the callout was meant for the pile and rank it cleared.
+        self.turn += 1
         if self.previous_player.cheated:
             self.previous_player.hand += self.deck
         else:
             caller.hand += self.deck
         self.deck = []
         self.current_value = 1
-        await self.broadcast_povs()
+        self.phase = Phase.AFTER_CALLOUT
+
+    def deal(self, seed: int) -> None:
+        self.create_hands(seed)
+        self.playing = True
+        self.phase = Phase.OPENING
+        self.discards_since_snapshot = 0
+
+    def state(self) -> dict:
+        """Everything needed to carry on the game, for event log snapshots."""
+        return {
+            "players": [
+                {"hand": p.hand.mask, "last-discard": [c.code for c in p.last_discard], "cheated": p.cheated}
+                for p in self.players
+            ],
+            "deck": [card.code for card in self.deck],
+            "current_value": self.current_value,
+            "current_player_index": self.current_player_index,
+            "phase": self.phase.value,
+            "turn": self.turn,
+        }
+
+    def restore(self, state: dict) -> None:
+        for player, saved in zip(self.players, state["players"]):
+            player.hand = Hand.from_mask(saved["hand"])
+            player.last_discard = [Card.from_code(code) for code in saved["last-discard"]]
+            player.cheated = saved["cheated"]
+        self.deck = [Card.from_code(code) for code in state["deck"]]
+        self.current_value = state["current_value"]
+        self.current_player_index = state["current_player_index"]
+        self.phase = Phase(state["phase"])
+        self.turn = state["turn"]
+        # Snapshots are taken as the count reaches SNAPSHOT_EVERY, then reset.
+        self.discards_since_snapshot = 0
 
     def print_povs(self) -> None:
         for player in self.players:
             print(player.name, json.dumps(self.pov_data(player), indent=4))
 
     async def broadcast_povs(self) -> None:
-        # todo: ai player
-        for player in self.human_players:
-            await player.websocket.send_json(self.pov_data(player))
+        self.version += 1
+        humans = self.human_players
+        shared = self.shared_pov()
+        BROADCAST_RECIPIENTS.observe(len(humans))
+        # Fan out concurrently so one slow socket doesn't hold up the others.
+        with BROADCAST_SECONDS.time():
+            await asyncio.gather(*(self.send_pov(player, shared) for player in humans), return_exceptions=True)
         for player in self.bot_players:
-            await player.update_pov(self.pov_data(player))
+            await player.update_pov(self.pov_data(player, shared=shared))
+
+    async def send_pov(self, player: HumanPlayer, shared: dict | None = None) -> None:
+        # A full snapshot the first time (or after a resync), then only diffs.
+        if player.sent_pov is None:
+            pov = self.pov_data(player, shared=shared)
+            message = snapshot(pov, self.version)
+        else:
+            pov = self.pov_data(player, with_hand=False, shared=shared)
+            message = diff(
+                player.sent_pov,
+                pov,
+                player.sent_mask,
+                player.hand.mask,
+                player.sent_version,
+                self.version,
+            )
+            if message is None:
+                return
+        player.sent_pov = pov
+        player.sent_mask = player.hand.mask
+        player.sent_version = self.version
+        await player.send(message)
 
-    def create_hands(self) -> None:
-        random.shuffle(self.deck)
+    def create_hands(self, seed: int) -> None:
+        # Seeded so the event log only needs the seed to reproduce the deal.
+        random.Random(seed).shuffle(self.deck)
         hand_size = len(self.deck) // len(self.players)
         for player in self.players:
             for i in range(hand_size):
@@ -120,57 +372,83 @@ class Cheat:
         while len(self.deck) > 0:
             next(player_iterator).hand.append(self.deck.pop())
 
+    def check_winner(self) -> bool:
+        # A player wins once they have emptied their hand and it is no longer
+        # possible to call them out: either the next discard went down
+        # unchallenged or a callout found they were honest.
+        if len(self.previous_player.hand) == 0:
+            self.winner = self.previous_player
+            self.playing = False
+            self.phase = Phase.FINISHED
+            self.record({"e": "end"})
+            self.log.info("game won", fields={"winner": self.winner.name, "turns": self.turn})
+        return self.winner is not None
+
+    def accepts(self, action: Action) -> bool:
+        if action.turn != self.turn:
+            return False
+        if action.kind is ActionKind.DISCARD:
+            return action.player is self.current_player and self.phase in (
+                Phase.OPENING,
+                Phase.DISCARD_OR_CALLOUT,
+                Phase.AFTER_CALLOUT,
+            )
+        return self.phase is Phase.DISCARD_OR_CALLOUT and action.player is not self.previous_player
+
+    async def dispatch(self, action: Action) -> None:
+        if not self.accepts(action):
+            await action.player.rejected(action, InvalidAction("out-of-turn", "that can't be played right now"))
+            return
+        if action.kind is ActionKind.DISCARD:
+            # Checked here rather than on receipt: the hand may have changed since.
+            try:
+                validate_discard(action.player.hand, action.cards)
+            except InvalidAction as error:
+                await action.player.rejected(action, error)
+                return
+            if self.phase is Phase.DISCARD_OR_CALLOUT and self.check_winner():
+                return
+            await self.discard(action.cards)
+        else:
+            await self.callout(action.player)
+            self.check_winner()
+
     async def start(self):
-        if not self.all_ready:
+        if not self.all_ready or self.playing:
             return
-        print("starting")
+        self.log.info("starting", fields={"players": len(self.players) + self.bot_count})
 
-        self.players.append(BotPlayer())
-        self.create_hands()
-        self.playing = True
+        for _ in range(self.bot_count):
+            self.join(BotPlayer())
+        seed = random.getrandbits(64)
+        self.record({"e": "deal", "seed": seed})
+        self.deal(seed)
+        self.turn_started_at = time.time()
         await self.broadcast_povs()
+        await self.run()
 
-        # await first discard
-        discard_list = await self.current_player.play_turn()
-        await self.discard(discard_list)
-
-        while True:
-            done, pending = await asyncio.wait(
-                [
-                    asyncio.create_task(self.current_player.play_turn_or_callout()),
-                ]
-                + [
-                    asyncio.create_task(p.callout())
-                    for p in list(
-                        filter(
-                            lambda p: p.name != self.previous_player.name
-                            and p.name != self.current_player.name,
-                            self.players,
-                        )
-                    )
-                ],
-                return_when=asyncio.FIRST_COMPLETED,
-            )
+    async def resume_game(self) -> None:
+        """Carries on a game rebuilt from the event log."""
+        self.turn_started_at = time.time()
+        await self.broadcast_povs()
+        await self.run()
+
+    async def run(self) -> None:
+        # Every player, human or bot, queues actions on the room; this loop is
+        # the only place the game state changes.
+        try:
+            while self.winner is None:
+                try:
+                    action = await asyncio.wait_for(self.actions.get(), self.turn_timeout())
+                except asyncio.TimeoutError:
+                    await self.play_for(self.current_player)
+                    continue
+                if action is not None:
+                    with ACTION_SECONDS.labels(action.kind.value).time():
+                        await self.dispatch(action)
+        finally:
+            for bot in self.bot_players:
+                bot.cancel_decision()
+                bot.cancel_speculation()
 
-            for task in pending:
-                task.cancel()
-
-            finished = done.pop()
-            result = await finished
-
-            if finished is self.current_player.play_turn_or_callout:
-                if isinstance(result, list):
-                    discard_list = result
-                    await self.discard(discard_list)
-                elif isinstance(result, Player):
-                    player = result
-                    await self.callout(player)
-                    # await discard
-                    discard_list = await self.current_player.play_turn()
-                    await self.discard(discard_list)
-            elif isinstance(result, Player):
-                await self.callout(result)
-                result: Player
-                # await discard
-                discard_list = await self.current_player.play_turn()
-                await self.discard(discard_list)
+        await self.broadcast({"winner": self.winner.name})
@@ -0,0 +1,253 @@
+"""
+Runs the game server as several worker processes behind one port.
+
+Each worker is a normal uvicorn process serving main:app on its own Unix
+socket and owning a shard of the rooms: a room lives on worker
+crc32(room id) % workers. A small router in this process accepts every
+connection, reads the request line and passes the connection through to
+the worker that owns the room, so every player of a game lands in the
+same process. Workers report their rooms to the router over another Unix
+socket, which gives it the directory it needs for requests that don't
+name a room (joining any open lobby, listing rooms).
+
+    python cluster.py --workers 4 --port 8000
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Environment the workers are started with, read by rooms.py.
+WORKER_INDEX_ENV = "CHEAT_WORKER_INDEX"
+WORKERS_ENV = "CHEAT_WORKERS"
+COORDINATOR_ENV = "CHEAT_COORDINATOR"
+# How often workers send the router their room list.
+REPORT_INTERVAL = 0.5
+# Reports older than this are from a worker that has gone away.
+REPORT_STALE = 5.0
+MAX_HEAD = 16 * 1024
+
+
+def shard_for(room_id: str, workers: int) -> int:
+    """The worker that owns a room; stable across processes, unlike hash()."""
+    return zlib.crc32(room_id.encode()) % workers
+
+
+def room_of_session(session: str) -> str:
+    # Session tokens are "<room id>.<secret>". Room ids can contain dots,
+    # secrets (token_urlsafe) can't.
+    return session.rsplit(".", 1)[0]
+
+
+class Directory:
+    """The router's view of every worker's rooms, as last reported."""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.reports: dict[int, tuple[float, list[dict]]] = {}
+        # A lobby handed out before its worker has reported it, so players
+        # arriving together still end up at the same table.
+        self.pending: str | None = None
+
+    def update(self, worker: int, rooms: list[dict]) -> None:
+        self.reports[worker] = (time.monotonic(), rooms)
+
+    def rooms(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {**room, "worker": worker}
+            for worker, (reported, rooms) in sorted(self.reports.items())
+            if now - reported < REPORT_STALE
+            for room in rooms
+        ]
+
+    def open_room(self) -> str:
+        rooms = self.rooms()
+        for room in rooms:
+            if room["joinable"]:
+                return room["id"]
+        if self.pending is None or any(room["id"] == self.pending for room in rooms):
+            # Either nothing is pending or its room has filled up since.
+            self.pending = uuid.uuid4().hex[:8]
+        return self.pending
+
+    def least_loaded(self) -> int:
+        counts = [0] * self.workers
+        for room in self.rooms():
+            counts[room["worker"]] += 1
+        return counts.index(min(counts))
+
+
+class Router:
+    def __init__(self, workers: int, socket_dir: str) -> None:
+        self.workers = workers
+        self.sockets = [os.path.join(socket_dir, f"worker-{i}.sock") for i in range(workers)]
+        self.coordinator = os.path.join(socket_dir, "coordinator.sock")
+        self.directory = Directory(workers)
+
+    def route(self, method: str, target: str) -> tuple[int | None, str]:
+        """
+        The worker a request goes to and the (possibly rewritten) target.
+        A worker of None means the router answers the request itself.
+        """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+
+        if parts[:1] == ["cheat"]:
+            if len(parts) > 1:
+                # Workers see the decoded room id, and so do session tokens.
+                return shard_for(unquote(parts[1]), self.workers), target
+            if "session" in query:
+                return shard_for(room_of_session(query["session"][0]), self.workers), target
+            # Send "join any lobby" to a specific lobby so it lands with its worker.
+            room_id = self.directory.open_room()
+            rewritten = f"/cheat/{room_id}" + (f"?{url.query}" if url.query else "")
+            return shard_for(room_id, self.workers), rewritten
+        if parts == ["rooms"]:
+            if method == "GET":
+                return None, target
+            return self.directory.least_loaded(), target
+        if parts == ["telemetry"] and "session" in query:
+            # Telemetry has to reach the process running the player's game.
+            return shard_for(room_of_session(query["session"][0]), self.workers), target
+        # /stats, /metrics and the test page are per worker: ?worker=N picks one.
+        worker = query.get("worker", ["0"])[0]
+        if not worker.isdigit():
+            raise ValueError(f"worker must be a number, not {worker!r}")
+        return int(worker) % self.workers, target
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        request_line, _, headers = head.partition(b"\r\n")
+        try:
+            method, target, version = request_line.decode("latin-1").split(" ")
+        except ValueError:
+            writer.close()
+            return
+
+        try:
+            worker, target = self.route(method, target)
+        except ValueError as e:
+            await self.respond(writer, {"detail": str(e)}, status="400 Bad Request")
+            return
+        if worker is None:
+            await self.respond(writer, {"rooms": self.directory.rooms()})
+            return
+        if b"upgrade: websocket" not in headers.lower():
+            # One request per connection, so keep-alive can't carry a later
+            # request past the router to the wrong worker.
+            headers = b"Connection: close\r\n" + b"\r\n".join(
+                line for line in headers.split(b"\r\n") if not line.lower().startswith(b"connection:")
+            )
+
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_unix_connection(self.sockets[worker])
+        except OSError:
+            await self.respond(writer, {"detail": f"worker {worker} unavailable"}, status="503 Service Unavailable")
+            return
+        upstream_writer.write(f"{method} {target} {version}\r\n".encode("latin-1") + headers)
+        await asyncio.gather(pipe(reader, upstream_writer), pipe(upstream_reader, writer))
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, body: dict, status: str = "200 OK") -> None:
+        payload = json.dumps(body).encode()
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode()
+            + payload
+        )
+        await writer.drain()
+        writer.close()
+
+    async def collect_reports(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async for line in reader:
+                report = json.loads(line)
+                self.directory.update(report["worker"], report["rooms"])
+        finally:
+            writer.close()
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while data := await reader.read(65536):
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def report_rooms(rooms, path: str, worker: int) -> None:
+    """Worker side: sends this process's room list to the router until cancelled."""
+    while True:
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+            while True:
+                writer.write(json.dumps({"worker": worker, "rooms": rooms.summaries()}).encode() + b"\n")
+                await writer.drain()
+                await asyncio.sleep(REPORT_INTERVAL)
+        except OSError:
+            await asyncio.sleep(REPORT_INTERVAL)
+
+
+async def serve(workers: int, host: str, port: int, socket_dir: str) -> None:
+    router = Router(workers, socket_dir)
+    coordinator = await asyncio.start_unix_server(router.collect_reports, router.coordinator)
+
+    processes = []
+    for index, path in enumerate(router.sockets):
+        env = {
+            **os.environ,
+            WORKER_INDEX_ENV: str(index),
+            WORKERS_ENV: str(workers),
+            COORDINATOR_ENV: router.coordinator,
+        }
+        processes.append(
+            await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "uvicorn", "main:app", "--uds", path,
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=env,
+            )
+        )
+
+    server = await asyncio.start_server(router.handle, host, port, limit=MAX_HEAD)
+    print(f"routing http://{host}:{port} to {workers} workers")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    exits = [asyncio.create_task(process.wait()) for process in processes]
+    await asyncio.wait([asyncio.create_task(stop.wait()), *exits], return_when=asyncio.FIRST_COMPLETED)
+
+    server.close()
+    coordinator.close()
+    for process in processes:
+        if process.returncode is None:
+            process.terminate()
+    await asyncio.gather(*(process.wait() for process in processes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--socket-dir", default=None, help="where worker sockets go (default: a temp dir)")
+    args = parser.parse_args()
+    socket_dir = args.socket_dir or tempfile.mkdtemp(prefix="cheat-")
+    asyncio.run(serve(args.workers, args.host, args.port, socket_dir))
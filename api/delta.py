@@ -0,0 +1,47 @@
+from card import CARD_STRS, codes_of
+
+# Top-level pov fields that are sent whenever they change. The hand and
+# player_info are diffed separately.
+SCALAR_FIELDS = (
+    "name",
+    "stack-size",
+    "waiting-for",
+    "previous-player",
+    "own-turn",
+    "can-callout",
+    "current_rank",
+)
+
+
+def snapshot(pov: dict, version: int) -> dict:
+    """Full state, sent when a client first joins or has to resync."""
+    return {"type": "snapshot", "version": version, **pov}
+
+
+def diff(old: dict, new: dict, old_mask: int, new_mask: int, base: int, version: int) -> dict | None:
+    """
+    Changes needed to turn the pov last sent to a client into the current one,
+    or None if nothing the client can see has changed. Hands are compared as
+    card bitmasks so only the cards that moved are serialised.
+    """
+    message = {"type": "delta", "base": base, "version": version}
+
+    added = new_mask & ~old_mask
+    removed = old_mask & ~new_mask
+    if added:
+        message["hand-added"] = [CARD_STRS[code] for code in codes_of(added)]
+    if removed:
+        message["hand-removed"] = [CARD_STRS[code] for code in codes_of(removed)]
+
+    for field in SCALAR_FIELDS:
+        if old.get(field) != new.get(field):
+            message[field] = new.get(field)
+
+    old_info = {p["name"]: p for p in old["player_info"]}
+    changed = [p for p in new["player_info"] if old_info.get(p["name"]) != p]
+    if changed:
+        message["player_info"] = changed
+
+    if len(message) == 3:
+        return None
+    return message
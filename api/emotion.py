@@ -0,0 +1,91 @@
+import numpy as np
+
+EMOTIONS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+# Readings this long either side of a discard describe the player's reaction to it.
+AROUND_BEFORE = 3.0
+AROUND_AFTER = 2.0
+# Readings before that, back to this far, are the player's baseline.
+BASELINE = 15.0
+# A reading is a spike when it is this many baseline deviations above the baseline mean.
+SPIKE_Z = 2.0
+MIN_CONFIDENCE = 0.5
+
+
+class EmotionHistory:
+    """
+    Fixed-size ring buffer of per-frame emotion readings, stored as parallel
+    arrays (scores, timestamps, face confidence) so window features are
+    computed with vectorised NumPy rather than per-sample Python.
+    """
+
+    def __init__(self, capacity: int = 512) -> None:
+        self.capacity = capacity
+        self.scores = np.zeros((capacity, len(EMOTIONS)), dtype=np.float32)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.confidence = np.zeros(capacity, dtype=np.float32)
+        self.head = 0
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, t: float, scores: list[float], confidence: float) -> None:
+        self.scores[self.head] = scores
+        self.times[self.head] = t
+        self.confidence[self.head] = confidence
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def valid(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Filled slots whose face confidence is usable, in insertion order."""
+        if self.count < self.capacity:
+            index = np.arange(self.count)
+        else:
+            index = np.roll(np.arange(self.capacity), -self.head)
+        keep = index[self.confidence[index] >= MIN_CONFIDENCE]
+        return self.times[keep], self.scores[keep], self.confidence[keep]
+
+    def features(self, at: float) -> dict | None:
+        """
+        Mean, variance, change from baseline and spike counts of each emotion
+        around time `at`, or None if there are no readings from then.
+        """
+        times, scores, confidence = self.valid()
+        around = (times >= at - AROUND_BEFORE) & (times <= at + AROUND_AFTER)
+        if not around.any():
+            return None
+        baseline = (times >= at - BASELINE) & (times < at - AROUND_BEFORE)
+
+        window = scores[around]
+        mean = window.mean(axis=0)
+        if baseline.sum() > 1:
+            base_mean = scores[baseline].mean(axis=0)
+            base_std = scores[baseline].std(axis=0)
+        else:
+            base_mean = mean
+            base_std = window.std(axis=0)
+        spikes = (window > base_mean + SPIKE_Z * np.maximum(base_std, 0.01)).sum(axis=0)
+
+        return {
+            "readings": int(around.sum()),
+            "confidence": float(confidence[around].mean()),
+            "mean": mean,
+            "delta": mean - base_mean,
+            "variance": window.var(axis=0),
+            "spikes": spikes,
+        }
+
+
+def describe_features(features: dict) -> str:
+    def row(values, sign: str = "") -> str:
+        return " ".join(f"{name} {value:{sign}.2f}" for name, value in zip(EMOTIONS, values))
+
+    spiking = [name for name, count in zip(EMOTIONS, features["spikes"]) if count]
+    return (
+        f"Face around their discard ({features['readings']} readings, confidence {features['confidence']:.2f}):\n"
+        f"  mean: {row(features['mean'])}\n"
+        f"  change from baseline: {row(features['delta'], '+')}\n"
+        f"  variance: {row(features['variance'])}\n"
+        f"  spikes: {', '.join(spiking) if spiking else 'none'}"
+    )
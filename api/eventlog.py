@@ -0,0 +1,251 @@
+"""
+Append-only log of every accepted action in a room, one JSON object per line:
+joins, ready-ups, the deal seed, discards and callouts, plus a snapshot of
+the game state after every SNAPSHOT_EVERY discards, however many callouts
+come between them. Writes are buffered and flushed with one fsync per batch.
+
+The server rebuilds unfinished games from these logs when it starts, and
+this module replays them offline:
+
+    python eventlog.py logs/ --verify
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Callable, Iterable
+
+from card import Card
+from cheat import Cheat
+from player import BotPlayer, HumanPlayer, secret_digest
+from wire import dumps, loads
+
+EVENT_LOG_DIR = os.getenv("CHEAT_EVENT_LOG_DIR")
+# How long an accepted action may sit in memory before it is on disk.
+FLUSH_INTERVAL = float(os.getenv("CHEAT_EVENT_FLUSH_INTERVAL", "0.05"))
+# Logs of closed rooms kept in the archive/ subdirectory; the oldest go first.
+ARCHIVE_KEEP = int(os.getenv("CHEAT_EVENT_LOG_KEEP", "1000"))
+
+DEAL_MARKER = b'{"e":"deal"'
+SNAPSHOT_MARKER = b'\n{"e":"snapshot"'
+
+
+class ReplayMismatch(Exception):
+    pass
+
+
+class EventLog:
+    """One room's log file. append() only buffers; EventStore writes in batches."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "ab")
+        self.pending: list[bytes] = []
+        self.closed = False
+
+    def append(self, event: dict) -> None:
+        self.pending.append(dumps(event).encode() + b"\n")
+
+    def take(self) -> bytes:
+        data = b"".join(self.pending)
+        self.pending = []
+        return data
+
+    def write(self, data: bytes) -> None:
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
+class EventStore:
+    """
+    The directory of room logs, and the task that flushes them. Logs of open
+    rooms sit at the top level, where recovery looks. Once a room is closed
+    its log moves to archive/, which keeps the newest `keep` logs.
+    """
+
+    def __init__(self, directory: str, keep: int = ARCHIVE_KEEP) -> None:
+        self.directory = directory
+        self.archive_dir = os.path.join(directory, "archive")
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.keep = keep
+        self.logs: dict[str, EventLog] = {}
+        # Archived log names, oldest first.
+        self.archived = sorted(
+            (name for name in os.listdir(self.archive_dir) if name.endswith(".log")),
+            key=lambda name: os.path.getmtime(os.path.join(self.archive_dir, name)),
+        )
+
+    def path(self, room_id: str) -> str:
+        return os.path.join(self.directory, f"{room_id}.log")
+
+    def open(self, room_id: str, resume: bool = False) -> EventLog:
+        path = self.path(room_id)
+        if not resume and os.path.exists(path):
+            # A new game under an old room id: keep the old game's log around.
+            self.archive(room_id)
+        log = self.logs[room_id] = EventLog(path)
+        return log
+
+    def archive(self, room_id: str) -> None:
+        name = f"{room_id}-{time.time_ns()}.log"
+        os.rename(self.path(room_id), os.path.join(self.archive_dir, name))
+        self.archived.append(name)
+        while len(self.archived) > self.keep:
+            try:
+                os.remove(os.path.join(self.archive_dir, self.archived.pop(0)))
+            except FileNotFoundError:
+                pass
+
+    def close(self, room_id: str) -> None:
+        log = self.logs.get(room_id)
+        if log is not None:
+            log.closed = True
+
+    def room_ids(self) -> list[str]:
+        """Rooms with a log that hasn't been archived: the ones recovery looks at."""
+        return [
+            name[:-4]
+            for name in sorted(os.listdir(self.directory))
+            if name.endswith(".log") and os.path.isfile(os.path.join(self.directory, name))
+        ]
+
+    async def flush(self) -> None:
+        batches = [(log, log.take()) for log in self.logs.values() if log.pending]
+        if batches:
+            # File writes and fsync block, so they happen off the event loop.
+            await asyncio.to_thread(write_batches, batches)
+        closed = [room_id for room_id, log in self.logs.items() if log.closed and not log.pending]
+        for room_id in closed:
+            self.logs.pop(room_id).file.close()
+        if closed:
+            await asyncio.to_thread(self.archive_all, closed)
+
+    def archive_all(self, room_ids: list[str]) -> None:
+        for room_id in room_ids:
+            # Unless the room id was reused for a new game since.
+            if room_id not in self.logs:
+                self.archive(room_id)
+
+    async def flusher(self) -> None:
+        try:
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+def write_batches(batches: list[tuple[EventLog, bytes]]) -> None:
+    for log, data in batches:
+        log.write(data)
+
+
+def read_events(path: str, from_snapshot: bool = True) -> Iterable[dict]:
+    """
+    A room's events in order. With from_snapshot, events between the deal
+    and the last snapshot are skipped, since the snapshot already covers them.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if from_snapshot:
+        deal = data.find(DEAL_MARKER)
+        snapshot = data.rfind(SNAPSHOT_MARKER)
+        if deal != -1 and snapshot > deal:
+            end_of_deal = data.index(b"\n", deal) + 1
+            data = data[:end_of_deal] + data[snapshot + 1:]
+    return (loads(line) for line in data.splitlines() if line)
+
+
+def make_bot(name: str) -> BotPlayer:
+    return BotPlayer(name=name)
+
+
+def apply(room: Cheat, event: dict, new_bot: Callable[[str], BotPlayer] = make_bot, verify: bool = False) -> None:
+    kind = event["e"]
+    if kind == "room":
+        room.bot_count = event["bot_count"]
+    elif kind == "join":
+        if event.get("bot"):
+            room.join(new_bot(event["name"]))
+        else:
+            player = HumanPlayer(None, event["name"])
+            player.secret = None
+            # Logs from before secrets were hashed hold the secret itself.
+            player.secret_hash = event["secret-hash"] if "secret-hash" in event else secret_digest(event["secret"])
+            room.join(player)
+    elif kind == "ready":
+        room.players[event["player"]].ready_up()
+    elif kind == "leave":
+        room.players.pop(event["player"])
+    elif kind == "deal":
+        room.deal(event["seed"])
+    elif kind == "discard":
+        room.apply_discard([Card.from_code(code) for code in event["cards"]])
+    elif kind == "callout":
+        room.apply_callout(room.players[event["player"]])
+    elif kind == "snapshot":
+        if verify and room.state() != event["state"]:
+            raise ReplayMismatch(f"room {room.id} diverged from its snapshot at turn {event['state']['turn']}")
+        room.restore(event["state"])
+    elif kind == "end":
+        room.check_winner()
+    elif kind == "closed":
+        room.playing = False
+
+
+def load_room(path: str, room_id: str, from_snapshot: bool = True, verify: bool = False) -> Cheat:
+    room = Cheat(room_id, bot_count=0)
+    for event in read_events(path, from_snapshot):
+        apply(room, event, verify=verify)
+    return room
+
+
+def recover(store: EventStore, owns: Callable[[str], bool]) -> list[Cheat]:
+    """Rooms whose game was still running when the log stopped, ready to carry on."""
+    rooms = []
+    for room_id in store.room_ids():
+        if not owns(room_id):
+            continue
+        room = load_room(store.path(room_id), room_id)
+        if room.playing:
+            room.events = store.open(room_id, resume=True)
+            rooms.append(room)
+    return rooms
+
+
+def log_paths(paths: list[str]) -> list[str]:
+    """Log files among `paths`; a directory contributes its logs and its archive's."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory in (path, os.path.join(path, "archive")):
+                if os.path.isdir(directory):
+                    found.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".log"))
+        else:
+            found.append(path)
+    return found
+
+
+def replay(paths: list[str], verify: bool) -> None:
+    files = log_paths(paths)
+    started = time.perf_counter()
+    games = turns = 0
+    for path in files:
+        room = load_room(path, os.path.basename(path)[:-4], from_snapshot=not verify, verify=verify)
+        games += 1
+        turns += room.turn
+    elapsed = time.perf_counter() - started
+    print(f"replayed {games} games, {turns:,} turns in {elapsed:.2f}s")
+    if elapsed > 0:
+        print(f"{games / elapsed:,.0f} games/s, {turns / elapsed:,.0f} turns/s")
+    if verify:
+        print("every snapshot matched")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="log files, or directories of them")
+    parser.add_argument("--verify", action="store_true", help="replay every event and check each snapshot")
+    args = parser.parse_args()
+    replay(args.paths, args.verify)
@@ -1,10 +1,24 @@
 import os
 import json
+import time
+import random
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import NamedTuple
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 from google.genai.errors import APIError
 
+from logs import get_logger
+from metrics import GEMINI_BATCH_SIZE, GEMINI_CALLS, GEMINI_COALESCED, GEMINI_ERRORS, GEMINI_QUEUED, GEMINI_SECONDS
+from telemetry import AGE_PATTERN
+
+log = get_logger("cheat.gemini")
+
 # --- Configuration ---
 # 1. Load environment variables
 load_dotenv()
@@ -22,12 +36,35 @@ try:
     client = genai.Client()
     
 except Exception as e:
-    print(f"Error initializing Gemini client: {e}")
+    log.warning("Gemini client not initialized", fields={"error": e})
     client = None
 
 # Model name is now just the ID, no need for the full URL path
 MODEL_NAME = "gemini-2.5-flash"
 
+# Every room shares this process, so cap how many requests are in flight at once
+# and give up on any single request that takes too long.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("GEMINI_MAX_CONCURRENT", "8"))
+REQUEST_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))
+
+# Decisions from every room share one queue (see InferenceScheduler). Ones that
+# arrive within BATCH_WINDOW seconds of each other and use the same instructions
+# go out together, up to MAX_BATCH per request. A rate limit pauses sending for
+# BACKOFF seconds, doubling on each one in a row up to BACKOFF_MAX.
+BATCH_WINDOW = float(os.getenv("GEMINI_BATCH_WINDOW", "0.02"))
+MAX_BATCH = int(os.getenv("GEMINI_MAX_BATCH", "8"))
+BACKOFF = float(os.getenv("GEMINI_BACKOFF", "1"))
+BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", "30"))
+
+# Where requests go: live (the API), record (the API, saving every prompt and
+# response to GEMINI_RECORDING) or replay (answers from that file, no network).
+BACKEND = os.getenv("GEMINI_BACKEND", "live")
+RECORDING_PATH = os.getenv("GEMINI_RECORDING", "gemini-recording.jsonl")
+# How long replayed answers take: "recorded" (as long as they did live), a
+# number of seconds, or "min:max" for a spread. Spreads are seeded by the
+# request, so a replayed game takes the same time on every run.
+REPLAY_LATENCY = os.getenv("GEMINI_REPLAY_LATENCY", "recorded")
+
 
 # --- Schemas (Using types.Schema for the SDK) ---
 
@@ -77,12 +114,401 @@ def get_move_schema() -> types.Schema:
     )
 
 
+# --- Backends ---
+
+class ReplayMiss(Exception):
+    pass
+
+
+class BatchMismatch(Exception):
+    pass
+
+
+class Request(NamedTuple):
+    prompt: str
+    system_prompt: str
+    response_schema: types.Schema
+
+
+def batch_prompt(prompts: list[str]) -> str:
+    requests = "\n\n".join(f"Request {i}: {prompt}" for i, prompt in enumerate(prompts, 1))
+    return (
+        f"Answer each of the following {len(prompts)} requests on its own, as if it were the only one. "
+        f"Return a JSON array with one item per request, setting Request to that request's number "
+        f"and Answer to its answer.\n\n{requests}"
+    )
+
+
+def batch_schema(response_schema: types.Schema) -> types.Schema:
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=types.Schema(
+            type=types.Type.OBJECT,
+            properties={
+                "Request": types.Schema(type=types.Type.INTEGER, description="The number of the request answered."),
+                "Answer": response_schema,
+            },
+            required=["Request", "Answer"],
+        ),
+    )
+
+
+def split_batch(text: str, count: int) -> list[str | Exception]:
+    """
+    Matches the items of a batched answer to requests by their Request
+    number rather than their position. Requests left without an answer get
+    a BatchMismatch; repeated and unknown numbers are ignored.
+    """
+    answers: list[str | Exception] = [BatchMismatch(f"no answer for request {i}") for i in range(1, count + 1)]
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise BatchMismatch(f"expected a list of answers, got {type(items).__name__}")
+    for item in items:
+        if not isinstance(item, dict) or "Answer" not in item:
+            continue
+        index = item.get("Request")
+        if isinstance(index, int) and 1 <= index <= count and isinstance(answers[index - 1], Exception):
+            answers[index - 1] = json.dumps(item["Answer"])
+    return answers
+
+
+def request_key(prompt: str, system_prompt: str, response_schema: types.Schema) -> str:
+    schema = response_schema.model_dump_json(exclude_none=True)
+    # Telemetry ages ("12s ago") change between runs of the same game, so a
+    # replay would never find them.
+    prompt = AGE_PATTERN.sub("?s ago", prompt)
+    return hashlib.sha256("\0".join((MODEL_NAME, system_prompt, schema, prompt)).encode()).hexdigest()
+
+
+class LiveBackend:
+    """Sends requests to the Gemini API."""
+
+    needs_client = True
+
+    async def generate(self, prompt: str, system_prompt: str, response_schema: types.Schema) -> str:
+        config = types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            response_mime_type="application/json",
+            response_schema=response_schema,
+        )
+        response = await client.aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=[prompt],
+            config=config,
+        )
+        return response.text
+
+    async def generate_many(self, requests: list[Request]) -> list[str | Exception]:
+        """
+        Answers requests that share a system prompt and schema in one call.
+        Each answer, or the error for a request that got none, is returned in
+        request order.
+        """
+        if len(requests) == 1:
+            return [await self.generate(*requests[0])]
+        _, system_prompt, response_schema = requests[0]
+        text = await self.generate(
+            batch_prompt([request.prompt for request in requests]),
+            system_prompt,
+            batch_schema(response_schema),
+        )
+        return split_batch(text, len(requests))
+
+
+class RecordingBackend(LiveBackend):
+    """
+    Sends requests to the Gemini API and appends each answer to a JSON lines
+    file. Batched answers are recorded one per request, so a replay finds
+    them however its own requests end up batched.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+
+    async def generate_many(self, requests: list[Request]) -> list[str | Exception]:
+        started = time.perf_counter()
+        answers = await super().generate_many(requests)
+        seconds = time.perf_counter() - started
+        lines = "".join(
+            json.dumps({
+                "key": request_key(*request),
+                "prompt": request.prompt,
+                "response": answer,
+                "seconds": seconds,
+            }) + "\n"
+            for request, answer in zip(requests, answers)
+            if not isinstance(answer, Exception)
+        )
+        # File writes block, so they happen off the event loop.
+        if lines:
+            await asyncio.to_thread(self.append, lines)
+        return answers
+
+    def append(self, line: str) -> None:
+        with self.lock, open(self.path, "a") as file:
+            file.write(line)
+
+
+class ReplayBackend:
+    """
+    Answers from a recording instead of the network, after a simulated delay.
+    Requests that were never recorded fail like an API error would, so bots
+    fall back to their local strategy.
+    """
+
+    needs_client = False
+
+    def __init__(self, path: str, latency: str = "recorded") -> None:
+        self.responses: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record["key"]] = record
+        self.latency = latency
+        log.info("replaying Gemini responses", fields={"path": path, "responses": len(self.responses)})
+
+    def delay(self, key: str, record: dict | None) -> float:
+        if self.latency == "recorded":
+            return record["seconds"] if record is not None else 0.0
+        if ":" in self.latency:
+            low, high = (float(bound) for bound in self.latency.split(":"))
+            return random.Random(key).uniform(low, high)
+        return float(self.latency)
+
+    async def generate(self, prompt: str, system_prompt: str, response_schema: types.Schema) -> str:
+        key = request_key(prompt, system_prompt, response_schema)
+        record = self.responses.get(key)
+        delay = self.delay(key, record)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if record is None:
+            raise ReplayMiss(f"no recorded response for request {key[:12]}")
+        return record["response"]
+
+    async def generate_many(self, requests: list[Request]) -> list[str | Exception]:
+        return await asyncio.gather(*(self.generate(*request) for request in requests), return_exceptions=True)
+
+
+def make_backend(name: str) -> LiveBackend | ReplayBackend:
+    if name == "record":
+        return RecordingBackend(RECORDING_PATH)
+    if name == "replay":
+        return ReplayBackend(RECORDING_PATH, REPLAY_LATENCY)
+    return LiveBackend()
+
+
+backend = make_backend(BACKEND)
+
+
+# --- Scheduler ---
+
+class Urgency:
+    """
+    Whether the requests made under it hold up a turn. Tasks inherit it from
+    the task that started them through `urgency`. Speculative work starts out
+    not blocking and is promoted if its turn comes while it is still queued.
+    """
+
+    def __init__(self, blocking: bool) -> None:
+        self.blocking = blocking
+
+
+BLOCKING = Urgency(True)
+urgency: ContextVar[Urgency] = ContextVar("gemini_urgency", default=BLOCKING)
+
+
+class Pending:
+    """One distinct request and the urgency of each decision waiting on it."""
+
+    def __init__(self, key: str, prompt: str, system_prompt: str, response_schema: types.Schema) -> None:
+        self.key = key
+        self.prompt = prompt
+        self.system_prompt = system_prompt
+        self.response_schema = response_schema
+        # Requests can share a call if their instructions and schema match.
+        self.kind = (system_prompt, response_schema.model_dump_json(exclude_none=True))
+        self.future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self.waiting: list[Urgency] = []
+        self.queued_at = time.monotonic()
+
+    @property
+    def blocking(self) -> bool:
+        return any(waiter.blocking for waiter in self.waiting)
+
+
+class InferenceScheduler:
+    """
+    Queues requests from every room and decides what is sent to the backend
+    and when. Identical requests share one call. Requests that use the same
+    instructions are sent as one prompt with an array answer, so under load
+    each call answers more decisions rather than more calls being made.
+    Decisions holding up a turn go before speculative ones, and a rate limit
+    puts the requests back in the queue and pauses sending.
+    """
+
+    def __init__(self, window: float, max_batch: int, max_in_flight: int, call_timeout: float) -> None:
+        self.window = window
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.call_timeout = call_timeout
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.queue: list[Pending] = []
+        self.pending: dict[str, Pending] = {}
+        self.backoff = 0.0
+        self.resume_at = 0.0
+        GEMINI_QUEUED.labels("blocking").set_function(lambda: sum(entry.blocking for entry in self.queue))
+        GEMINI_QUEUED.labels("speculative").set_function(lambda: sum(not entry.blocking for entry in self.queue))
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is self.loop:
+            return
+        # First use, or a new event loop (simulate.py runs one per benchmark).
+        self.loop = loop
+        self.queue = []
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.max_in_flight)
+        self.calls: set[asyncio.Task] = set()
+        self.dispatcher = loop.create_task(self.dispatch())
+
+    async def request(self, prompt: str, system_prompt: str, response_schema: types.Schema) -> str:
+        """The backend's answer to the request, whichever call it comes from."""
+        self.start()
+        key = request_key(prompt, system_prompt, response_schema)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = self.pending[key] = Pending(key, prompt, system_prompt, response_schema)
+            self.queue.append(entry)
+            self.wakeup.set()
+        else:
+            GEMINI_COALESCED.inc()
+        waiter = urgency.get()
+        entry.waiting.append(waiter)
+        try:
+            # Shielded: one decision giving up mustn't cancel the answer for the rest.
+            return await asyncio.shield(entry.future)
+        finally:
+            entry.waiting.remove(waiter)
+            if not entry.waiting and not entry.future.done():
+                self.abandon(entry)
+
+    def abandon(self, entry: Pending) -> None:
+        """
+        Drops a request nothing is waiting for. One already sent is left to
+        finish: it counts against the rate limit either way, and its slot
+        should stay taken until it does.
+        """
+        entry.future.cancel()
+        self.forget(entry)
+        if entry in self.queue:
+            self.queue.remove(entry)
+
+    def forget(self, entry: Pending) -> None:
+        if self.pending.get(entry.key) is entry:
+            del self.pending[entry.key]
+
+    async def dispatch(self) -> None:
+        while True:
+            if not self.queue:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            await self.slots.acquire()
+            # Give requests from other rooms a moment to join the oldest one,
+            # and wait out any backoff.
+            oldest = min((entry.queued_at for entry in self.queue), default=time.monotonic())
+            await asyncio.sleep(max(0.0, oldest + self.window - time.monotonic(), self.resume_at - time.monotonic()))
+            batch = self.take()
+            if not batch:
+                self.slots.release()
+                continue
+            call = asyncio.create_task(self.send(batch))
+            # The loop only keeps weak references to tasks.
+            self.calls.add(call)
+            call.add_done_callback(self.calls.discard)
+
+    def take(self) -> list[Pending]:
+        """The next call's requests: the most urgent one and others like it."""
+        if not self.queue:
+            return []
+        ordered = sorted(self.queue, key=lambda entry: (not entry.blocking, entry.queued_at))
+        batch = [entry for entry in ordered if entry.kind == ordered[0].kind][:self.max_batch]
+        for entry in batch:
+            self.queue.remove(entry)
+        return batch
+
+    async def send(self, batch: list[Pending]) -> None:
+        try:
+            answers = await self.call(batch)
+        except APIError as e:
+            if e.code == 429:
+                GEMINI_CALLS.labels("rate-limited").inc()
+                self.rate_limited(batch)
+                return
+            GEMINI_CALLS.labels("error").inc()
+            self.settle(batch, error=e)
+        except asyncio.TimeoutError as e:
+            GEMINI_CALLS.labels("timeout").inc()
+            self.settle(batch, error=e)
+        except Exception as e:
+            GEMINI_CALLS.labels("error").inc()
+            self.settle(batch, error=e)
+        else:
+            GEMINI_CALLS.labels("ok").inc()
+            self.backoff = 0.0
+            self.settle(batch, answers)
+        finally:
+            self.slots.release()
+
+    async def call(self, batch: list[Pending]) -> list[str | Exception]:
+        GEMINI_BATCH_SIZE.observe(len(batch))
+        # The SDK has no HTTP timeout by default, and a call that never
+        # returns would hold its slot for good.
+        return await asyncio.wait_for(
+            backend.generate_many([Request(entry.prompt, entry.system_prompt, entry.response_schema) for entry in batch]),
+            timeout=self.call_timeout,
+        )
+
+    def settle(self, batch: list[Pending], answers: list[str | Exception] | None = None, error: Exception | None = None) -> None:
+        for i, entry in enumerate(batch):
+            self.forget(entry)
+            if entry.future.done():
+                continue
+            answer = error if error is not None else answers[i]
+            if isinstance(answer, Exception):
+                entry.future.set_exception(answer)
+            else:
+                entry.future.set_result(answer)
+
+    def rate_limited(self, batch: list[Pending]) -> None:
+        self.backoff = min(BACKOFF_MAX, self.backoff * 2 if self.backoff else BACKOFF)
+        # Jittered so cluster workers, each with its own scheduler, don't retry in step.
+        self.resume_at = time.monotonic() + self.backoff * random.uniform(0.5, 1.0)
+        log.warning("Gemini rate limited, backing off", fields={"seconds": round(self.backoff, 2), "requests": len(batch)})
+        self.queue[:0] = [entry for entry in batch if not entry.future.done()]
+        self.wakeup.set()
+
+
+scheduler = InferenceScheduler(BATCH_WINDOW, MAX_BATCH, MAX_CONCURRENT_REQUESTS, REQUEST_TIMEOUT)
+
+
 # --- Core API Call Function (Simplified) ---
 
-def generate_content_sdk(prompt: str, system_prompt: str, response_schema: types.Schema) -> dict | str:
+async def generate_content_sdk(prompt: str, system_prompt: str, response_schema: types.Schema) -> dict | str:
     """
-    Sends a prompt to the Gemini API using the official SDK.
-    The SDK handles retries and API error decoding.
+    Sends a prompt to the Gemini API using the official SDK's async client,
+    so the event loop keeps serving other games while the request is in flight.
+    The SDK handles retries and API error decoding. With GEMINI_BACKEND set,
+    the request is recorded or answered from a recording instead.
+
+    Requests go through the scheduler, which may answer several with one call;
+    at most MAX_CONCURRENT_REQUESTS calls run at once. Each request, queueing
+    included, is bounded by REQUEST_TIMEOUT, and so is each call the scheduler
+    sends. Cancelling the awaiting task drops
+    the request if it hasn't been sent yet.
 
     Args:
         prompt: The main text prompt.
@@ -92,54 +518,143 @@ def generate_content_sdk(prompt: str, system_prompt: str, response_schema: types
     Returns:
         dict: The parsed JSON result, or a string error message.
     """
-    if client is None:
+    if backend.needs_client and client is None:
+        GEMINI_ERRORS.labels("uninitialized").inc()
         return "Error: Gemini client not initialized. Check your API key setup."
 
-    try:
-        # Configuration is now passed as a single object (GenerationConfig)
-        config = types.GenerateContentConfig(
-            system_instruction=system_prompt,
-            response_mime_type="application/json",
-            response_schema=response_schema,
-        )
+    started = time.perf_counter()
 
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=[prompt],
-            config=config,
+    def failed(reason: str, message: str) -> str:
+        GEMINI_SECONDS.labels("error").observe(time.perf_counter() - started)
+        GEMINI_ERRORS.labels(reason).inc()
+        log.warning("Gemini request failed", fields={"reason": reason, "error": message})
+        return message
+
+    try:
+        text = await asyncio.wait_for(
+            scheduler.request(prompt, system_prompt, response_schema),
+            timeout=REQUEST_TIMEOUT,
         )
 
-        # The response.text is guaranteed to be valid JSON due to response_mime_type="application/json"
-        return json.loads(response.text)
+        # The text is guaranteed to be valid JSON due to response_mime_type="application/json"
+        result = json.loads(text)
+        GEMINI_SECONDS.labels("ok").observe(time.perf_counter() - started)
+        return result
 
+    except asyncio.TimeoutError:
+        return failed("timeout", f"API Request Timed Out after {REQUEST_TIMEOUT}s")
+    except ReplayMiss as e:
+        return failed("replay-miss", str(e))
+    except BatchMismatch as e:
+        return failed("batch", f"Batched answer didn't match the requests: {e}")
     except APIError as e:
         # SDK handles all 4xx/5xx errors and retries gracefully, raising APIError for final failures.
-        return f"API Request Failed: {e}"
+        return failed("api", f"API Request Failed: {e}")
     except Exception as e:
-        return f"An unexpected error occurred: {e}"
+        return failed("other", f"An unexpected error occurred: {e}")
+
+
+# --- Decision Cache ---
+
+class DecisionCache:
+    """
+    Bounded LRU cache of model decisions with a time-to-live, so that the same
+    (or an equivalent) game situation doesn't cost another request.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[tuple, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: tuple) -> dict | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: tuple, value: dict) -> None:
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+decision_cache = DecisionCache(
+    maxsize=int(os.getenv("GEMINI_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("GEMINI_CACHE_TTL", "600")),
+)
+
+
+def state_key(state: dict) -> tuple:
+    """
+    Canonical encoding of the parts of a pov that matter to a decision.
+    Hand order and opponent seating are ignored, so equivalent situations
+    share a key.
+    """
+    return (
+        tuple(sorted(state["hand"])),
+        state["current_rank"],
+        state["stack-size"],
+        tuple(sorted((p["cards"], p["last-discard"]) for p in state["player_info"])),
+    )
 
 
 # --- Business Logic Functions (Simplified) ---
 
-def analyze_bluff(move: str, state: str, emotion_data: str) -> dict:
+async def analyze_bluff(move: str, state: dict, emotion_data: str) -> dict:
     """
     Determines if an opponent is bluffing based on their move, 
     the game state, and emotional data.
     """
+    key = ("bluff", move, state_key(state), emotion_data)
+    cached = decision_cache.get(key)
+    if cached is not None:
+        return cached
+
     basic_query = (
-        f"Is this player bluffing? Move: {move} Game State: {state} Emotion Data: {emotion_data}"
+        f"Is this player bluffing? Move: {move} Game State: {json.dumps(state)} Emotion Data: {emotion_data}"
     )
     
     system_prompt = (
         "Your name is Otis. You are playing the card game Cheat. It is your job to determine whether the "
         "player is bluffing or not. You will be given the player's move, the state of the game, "
         "and data on the player (Facial Emotion Recognition & voice-to-text). "
-        "The data is the last 5 facial expression readings, as percentage confidence in up to seven emotions, "
-        "with the 6th line holding the latest recorded sentence of speech. "
+        "The data lists recent sentences the player said, the words they said while discarding, "
+        "and features of their facial expression around the discard: for seven emotions, the mean score (0-1), "
+        "its change from the player's baseline, its variance, and which emotions spiked. "
+        "It may be empty if the player has no camera. "
         "Base your decision on the game state and the player's emotional data and return a JSON object."
     )
 
-    result = generate_content_sdk(
+    result = await generate_content_sdk(
         prompt=basic_query, 
         system_prompt=system_prompt,
         response_schema=get_cheat_analysis_schema()
@@ -149,18 +664,24 @@ def analyze_bluff(move: str, state: str, emotion_data: str) -> dict:
     if isinstance(result, str):
         return {"Error": result}
     
+    decision_cache.put(key, result)
     return result
 
 
-def move(hand: list, state: str) -> dict:
+async def move(hand: list, state: dict) -> dict:
     """
     Suggests the best move (cards to play and rank to announce) for the AI.
     """
+    key = ("move", tuple(sorted(hand)), state_key(state))
+    cached = decision_cache.get(key)
+    if cached is not None:
+        return cached
+
     hand_str = ", ".join(hand)
 
     basic_query = (
         f"You are playing the card game Cheat, you'd like to win. Your hand is: {hand_str}. "
-        f"The current game state is: {state}. What is the best move to make right now? "
+        f"The current game state is: {json.dumps(state)}. What is the best move to make right now? "
         "What rank are you announcing, and what actual cards will you play from your hand. You can bluff."
     )
     
@@ -172,7 +693,7 @@ def move(hand: list, state: str) -> dict:
         "Return the decision as a JSON object."
     )
 
-    result = generate_content_sdk(
+    result = await generate_content_sdk(
         prompt=basic_query, 
         system_prompt=system_prompt,
         response_schema=get_move_schema()
@@ -182,4 +703,5 @@ def move(hand: list, state: str) -> dict:
     if isinstance(result, str):
         return {"Error": result}
         
+    decision_cache.put(key, result)
     return result
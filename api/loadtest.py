@@ -0,0 +1,268 @@
+"""
+Load generator for the game server over real websockets. Starts the server
+(uvicorn main:app, with local heuristic bots instead of Gemini) unless --url
+is given, then ramps up simulated players in steps. Each player joins a
+room, readies up and plays: discarding on its turn and sometimes calling
+cheat. Per step it reports connection setup time, discard round trips,
+how far apart the players of a room receive the same update, and the
+server's CPU and memory use.
+
+    python loadtest.py --steps 8,32,128 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from dataclasses import dataclass, field
+
+from websockets.asyncio.client import connect
+
+# A game that runs longer than this is counted as an error and abandoned.
+GAME_TIMEOUT = 60.0
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@dataclass
+class StepStats:
+    connect_times: list[float] = field(default_factory=list)
+    round_trips: list[float] = field(default_factory=list)
+    broadcast_lags: list[float] = field(default_factory=list)
+    actions: int = 0
+    games: int = 0
+    rejected: int = 0
+    errors: int = 0
+
+
+class Table:
+    """
+    What the simulated players of one room share: a barrier so they all sit
+    down before anyone readies up (the game starts as soon as everyone
+    present is ready), and when the first of them saw each state version.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.seated = asyncio.Barrier(size)
+        self.first_seen: dict[int, float] = {}
+
+    def seen(self, version: int, at: float) -> float:
+        first = self.first_seen.setdefault(version, at)
+        return at - first
+
+
+class ServerProcess:
+    """The server under test, and its CPU time and memory from /proc."""
+
+    def __init__(self, pid: int | None) -> None:
+        self.pid = pid
+
+    def cpu_seconds(self) -> float | None:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime and stime, fields 14 and 15 of the full line.
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def rss_mb(self) -> float | None:
+        if self.pid is None:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+
+async def play(url: str, name: str, table: Table, stats: StepStats, think: float, callout_rate: float, rng: random.Random, deadline: float) -> None:
+    """One simulated player for one game."""
+    started = time.perf_counter()
+    async with connect(url, open_timeout=30) as websocket:
+        await websocket.send(name)
+        await websocket.recv()  # the session message: we're in the room
+        stats.connect_times.append(time.perf_counter() - started)
+        try:
+            # Tablemates still connecting when the step ends never arrive.
+            async with asyncio.timeout(max(0.0, deadline - time.perf_counter())):
+                await table.seated.wait()
+        except TimeoutError:
+            await table.seated.abort()
+            return
+        await websocket.send("ready")
+
+        state: dict = {}
+        hand: set[str] = set()
+        # The discard in flight: when it was sent and one of its cards.
+        pending: list | None = None
+        thinking: asyncio.Task | None = None
+
+        async def discard(cards: list[str], inflight: list) -> None:
+            # Think in a separate task so updates are still read, and
+            # timed, as they arrive.
+            await asyncio.sleep(think)
+            inflight[0] = time.perf_counter()
+            await websocket.send(json.dumps({"discard": cards}))
+            stats.actions += 1
+
+        async for frame in websocket:
+            now = time.perf_counter()
+            message = json.loads(frame)
+            kind = message.get("type")
+            if "winner" in message:
+                stats.games += 1
+                if thinking is not None:
+                    thinking.cancel()
+                return
+            if kind == "error":
+                # A callout that lost the race with the next discard, or a
+                # discard stamped with a turn a callout just ended. Either
+                # way, look at the state again and act on it.
+                stats.rejected += 1
+                pending = None
+            elif kind in ("snapshot", "delta"):
+                stats.broadcast_lags.append(table.seen(message["version"], now))
+                if kind == "snapshot":
+                    hand = set(message["hand"])
+                hand -= set(message.get("hand-removed", ()))
+                hand |= set(message.get("hand-added", ()))
+                state.update({k: v for k, v in message.items() if k not in ("hand", "hand-added", "hand-removed")})
+            else:
+                continue
+
+            if pending is not None:
+                sent_at, card = pending
+                if sent_at is None or card not in message.get("hand-removed", ()):
+                    continue
+                stats.round_trips.append(now - sent_at)
+                pending = None
+
+            if state.get("own-turn") and hand:
+                rank = state["current_rank"]
+                cards = [c for c in hand if int(c[1:]) == rank][:4] or [rng.choice(sorted(hand))]
+                pending = [None, cards[0]]
+                thinking = asyncio.create_task(discard(cards, pending))
+            elif state.get("can-callout") and rng.random() < callout_rate:
+                state["can-callout"] = False
+                await websocket.send(json.dumps({"callout": True}))
+                stats.actions += 1
+
+
+async def run_step(base: str, clients: int, room_size: int, duration: float, think: float, callout_rate: float, seed: int, step: int) -> StepStats:
+    stats = StepStats()
+    rng = random.Random(seed + step)
+    deadline = time.perf_counter() + duration
+
+    async def seat(index: int) -> None:
+        # Keep playing games in fresh rooms until the step's time is up. A
+        # room's players finish each game together, so they agree on the
+        # next room's id without talking to each other.
+        # The last table takes whoever is left over, so nobody waits for
+        # players that don't exist.
+        first = index - index % room_size
+        size = min(room_size, clients - first)
+        game = 0
+        while time.perf_counter() < deadline:
+            room = f"load{step}-{index // room_size}-{game}"
+            table = tables.setdefault(room, Table(size))
+            try:
+                async with asyncio.timeout(GAME_TIMEOUT):
+                    await play(f"{base}/cheat/{room}", f"p{index}", table, stats, think, callout_rate, rng, deadline)
+            except Exception:
+                stats.errors += 1
+                # Don't leave the rest of the table waiting for this player.
+                await table.seated.abort()
+            game += 1
+
+    tables: dict[str, Table] = {}
+    await asyncio.gather(*(seat(i) for i in range(clients)))
+    return stats
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "CHEAT_BOT_STRATEGY": "heuristic",
+        "CHEAT_LOG_LEVEL": "WARNING",
+        "CHEAT_MAX_ROOMS": "100000",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/rooms", timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("server did not start")
+
+
+def report(clients: int, stats: StepStats, elapsed: float, cpu: float | None, rss: float | None) -> None:
+    ms = 1000
+    print(
+        f"{clients:>7}"
+        f"{percentile(stats.connect_times, 0.5) * ms:>9.1f}{percentile(stats.connect_times, 0.99) * ms:>9.1f}"
+        f"{percentile(stats.round_trips, 0.5) * ms:>9.1f}{percentile(stats.round_trips, 0.99) * ms:>9.1f}"
+        f"{percentile(stats.broadcast_lags, 0.5) * ms:>9.2f}{percentile(stats.broadcast_lags, 0.99) * ms:>9.2f}"
+        f"{stats.actions / elapsed:>10.0f}{stats.games:>7}{stats.rejected:>9}{stats.errors:>7}"
+        f"{'' if cpu is None else f'{cpu:>7.0f}%'}{'' if rss is None else f'{rss:>9.1f}'}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    server = None
+    if args.url is None:
+        server = start_server(args.port)
+        base, pid = f"ws://127.0.0.1:{args.port}", server.pid
+    else:
+        base, pid = args.url, args.pid
+    process = ServerProcess(pid)
+
+    print(f"{'':>7}{'connect ms':>18}{'discard rtt ms':>18}{'fan-out lag ms':>18}")
+    print(f"{'clients':>7}{'p50':>9}{'p99':>9}{'p50':>9}{'p99':>9}{'p50':>9}{'p99':>9}{'actions/s':>10}{'games':>7}{'rejected':>9}{'errors':>7}{'cpu':>8}{'rss MB':>9}")
+    try:
+        for step, clients in enumerate(args.steps):
+            cpu_before, started = process.cpu_seconds(), time.perf_counter()
+            stats = await run_step(base, clients, args.room_size, args.duration, args.think, args.callout_rate, args.seed, step)
+            elapsed = time.perf_counter() - started
+            cpu_after = process.cpu_seconds()
+            cpu = None if cpu_before is None or cpu_after is None else (cpu_after - cpu_before) / elapsed * 100
+            report(clients, stats, elapsed, cpu, process.rss_mb())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=lambda s: [int(n) for n in s.split(",")], default=[4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--room-size", type=int, default=3, help="simulated players per room (one bot joins too)")
+    parser.add_argument("--think", type=float, default=0.05, help="seconds a player waits before discarding")
+    parser.add_argument("--callout-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--url", help="test a running server instead, e.g. ws://localhost:8000")
+    parser.add_argument("--pid", type=int, help="with --url, the server's pid for CPU and memory")
+    asyncio.run(main(parser.parse_args()))
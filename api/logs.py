@@ -0,0 +1,55 @@
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("CHEAT_LOG_LEVEL", "INFO")
+
+
+class KeyValueFormatter(logging.Formatter):
+    """`time level logger message key=value ...`, with fields from the record's `fields`."""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class ContextLogger(logging.LoggerAdapter):
+    """
+    Adds fixed context (e.g. the room id) to every record, plus any
+    `fields={...}` passed to the call.
+    """
+
+    def process(self, msg, kwargs):
+        fields = {**self.extra, **kwargs.pop("fields", {})}
+        kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+
+def get_logger(name: str, **context) -> ContextLogger:
+    return ContextLogger(logging.getLogger(name), context)
+
+
+def setup_logging(level: str = LOG_LEVEL) -> QueueListener:
+    """
+    Routes every record through a queue so the event loop only pays for an
+    enqueue; a listener thread does the formatting and writing. Returns the
+    listener, already started; stop it on shutdown to flush what is left.
+    """
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(KeyValueFormatter())
+    listener = QueueListener(records, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(records)]
+    root.setLevel(level)
+    listener.start()
+    return listener
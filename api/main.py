@@ -1,13 +1,46 @@
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import re
 from cheat import Cheat
+from gemini import decision_cache
+from logs import get_logger, setup_logging
+from metrics import GAMES_PLAYING, PLAYERS_CONNECTED, REGISTRY, ROOMS_ACTIVE, monitor_loop_lag
 from player import HumanPlayer
+from cluster import report_rooms
+from eventlog import EVENT_LOG_DIR, EventStore
+from rooms import COORDINATOR, WORKER_INDEX, RoomLimitReached, RoomManager
+from telemetry import InvalidSample, telemetry
+from wire import JsonCodec, MsgpackCodec, codec_for, loads
 
-app = FastAPI()
+rooms = RoomManager(events=EventStore(EVENT_LOG_DIR) if EVENT_LOG_DIR else None)
+log = get_logger("cheat.server")
 
-cheat = Cheat()
+ROOMS_ACTIVE.set_function(lambda: len(rooms))
+GAMES_PLAYING.set_function(lambda: sum(room.playing for room in rooms.rooms.values()))
+PLAYERS_CONNECTED.set_function(
+    lambda: sum(p.connected for room in rooms.rooms.values() for p in room.human_players)
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    listener = setup_logging()
+    background = [asyncio.create_task(rooms.reaper()), asyncio.create_task(monitor_loop_lag())]
+    if COORDINATOR is not None:
+        background.append(asyncio.create_task(report_rooms(rooms, COORDINATOR, WORKER_INDEX)))
+    if rooms.events is not None:
+        rooms.recover()
+        background.append(asyncio.create_task(rooms.events.flusher()))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 @app.get("/")
@@ -31,33 +64,151 @@ async def root():
     )
 
 
+@app.get("/rooms")
+async def list_rooms():
+    return {"rooms": rooms.summaries(), "max": rooms.max_rooms}
+
+
+@app.post("/rooms")
+async def create_room():
+    try:
+        room = rooms.create()
+    except RoomLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return room.summary()
+
+
+@app.get("/stats")
+async def stats():
+    return {"rooms": len(rooms), "decision_cache": decision_cache.stats()}
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.websocket("/telemetry")
+async def telemetry_endpoint(websocket: WebSocket, session: str | None = None):
+    """
+    Emotion and speech samples pushed by a player's vision client. The client
+    names the seat with the session token the game client was given.
+    """
+    await websocket.accept()
+    player = rooms.find_session(session) if session else None
+    if player is None:
+        await websocket.close(code=1008, reason="unknown session")
+        return
+    buffer = telemetry.buffer(player.room.id, player.name)
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            try:
+                data = loads(frame)
+            except ValueError as e:
+                log.warning("ignored bad telemetry frame", fields={"player": player.name, "error": e})
+                continue
+            for sample in data if isinstance(data, list) else [data]:
+                try:
+                    buffer.add(sample)
+                except InvalidSample as e:
+                    log.warning("ignored bad telemetry sample", fields={"player": player.name, "error": e})
+    except WebSocketDisconnect:
+        pass
+
+
+# ?format=msgpack switches a connection's game messages to binary msgpack frames.
 @app.websocket("/cheat")
-async def websocket_endpoint(websocket: WebSocket):
-    if cheat.all_ready:
-        print("already playing")
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session: str | None = None,
+    wire_format: str | None = Query(None, alias="format"),
+):
+    codec = codec_for(wire_format)
+    if session is not None:
+        await resume(websocket, rooms.find_session(session), codec)
+        return
+    try:
+        room = rooms.find_open()
+    except RoomLimitReached:
+        await websocket.close(code=1013)
+        return
+    await play(websocket, room, codec)
+
+
+@app.websocket("/cheat/{room_id}")
+async def room_websocket_endpoint(
+    websocket: WebSocket,
+    room_id: str,
+    session: str | None = None,
+    wire_format: str | None = Query(None, alias="format"),
+):
+    codec = codec_for(wire_format)
+    if session is not None:
+        room = rooms.get(room_id)
+        await resume(websocket, room.find_session(session) if room is not None else None, codec)
+        return
+    try:
+        room = rooms.get_or_create(room_id)
+    except RoomLimitReached:
+        await websocket.close(code=1013)
+        return
+    await play(websocket, room, codec)
+
+
+async def play(websocket: WebSocket, cheat: Cheat, codec: JsonCodec | MsgpackCodec):
+    if not cheat.joinable:
+        log.info("rejected join, game already running", fields={"room": cheat.id})
+        await websocket.close(code=1008)
         return
 
     await websocket.accept()
 
+    player = None
     try:
         # name
         data = await websocket.receive_text()
         name = re.sub(r"\s+", "", data)
-        player = HumanPlayer(websocket, name)
+        player = HumanPlayer(websocket, name, codec)
         cheat.join(player)
-        await cheat.broadcast({"message": f"Player {name} joined."})
+        await player.send({"session": player.session, "room": cheat.id, "format": codec.name})
+        await cheat.broadcast({"message": f"Player {name} joined.", "room": cheat.id})
+        await take_seat(cheat, player)
+    except WebSocketDisconnect:
+        log.info("player disconnected", fields={"room": cheat.id, "player": player.name if player else None})
+    finally:
+        if player is not None:
+            cheat.leave(player)
 
-        # ready
-        await websocket.receive_text()
-        player.ready_up()
-        print(f"{player.name} ready")
-        await cheat.broadcast({"message": f"Player {name} ready."})
-        asyncio.create_task(cheat.start())
 
-        while True:
-            await asyncio.sleep(1)
-            if cheat.playing:
-                pass
-                # print(f"sending {player.name} the game data")
+async def resume(websocket: WebSocket, player: HumanPlayer | None, codec: JsonCodec | MsgpackCodec):
+    """Puts a reconnecting client back in its seat, mid-game or in the lobby."""
+    await websocket.accept()
+    if player is None:
+        await websocket.close(code=1008, reason="unknown session")
+        return
+
+    cheat = player.room
+    try:
+        await cheat.resume(player, websocket, codec)
+        await cheat.broadcast({"message": f"Player {player.name} reconnected."})
+        await take_seat(cheat, player)
     except WebSocketDisconnect:
-        print("Failed to join cheat")
+        log.info("player disconnected", fields={"room": cheat.id, "player": player.name})
+    finally:
+        cheat.leave(player)
+
+
+async def take_seat(cheat: Cheat, player: HumanPlayer):
+    # ready
+    if not player.ready:
+        await player.websocket.receive_text()
+        cheat.ready_up(player)
+        log.info("player ready", fields={"room": cheat.id, "player": player.name})
+        await cheat.broadcast({"message": f"Player {player.name} ready."})
+        if cheat.all_ready and cheat.game_task is None:
+            cheat.game_task = asyncio.create_task(cheat.start())
+
+    # This connection's only reader from here on: frames become actions
+    # on the room's queue.
+    await player.read_actions()
@@ -0,0 +1,244 @@
+import asyncio
+import math
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable
+
+# Upper bounds in seconds, from a fast in-process step up to a slow model call.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LOOP_LAG_INTERVAL = 0.5
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list["Metric"] = []
+
+    def register(self, metric: "Metric") -> None:
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    """
+    A named metric with optional labels. Each distinct set of label values
+    gets its own child; an unlabelled metric is used directly through its
+    single child. Only touched from the event loop, so no locking.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: tuple[str, ...] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.description = description
+        self.labelnames = labelnames
+        self.children: dict[tuple[str, ...], object] = {}
+        if not labelnames:
+            self.labels()
+        registry.register(self)
+
+    def labels(self, *values) -> object:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self.new_child()
+        return child
+
+    @abstractmethod
+    def new_child(self) -> object:
+        pass
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in self.children.items():
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                lines.append(f"{self.name}{suffix}{format_labels({**labels, **extra})} {format_value(value)}")
+        return lines
+
+
+class CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("counters only go up")
+        self.value += amount
+
+    def samples(self):
+        yield "", {}, self.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, *args, **kwargs) -> None:
+        # Counter samples end in _total, and the text format wants HELP and
+        # TYPE to name the same series.
+        super().__init__(f"{name}_total", *args, **kwargs)
+
+    def new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class GaugeChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Reads the value from `function` at scrape time instead."""
+        self.function = function
+
+    def samples(self):
+        yield "", {}, self.function() if self.function is not None else self.value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+
+class HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield "_bucket", {"le": format_value(bound)}, cumulative
+        yield "_bucket", {"le": "+Inf"}, self.count
+        yield "_sum", {}, self.sum
+        yield "_count", {}, self.count
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(*args, **kwargs)
+
+    def new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+
+# --- Game server metrics ---
+
+ROOMS_ACTIVE = Gauge("cheat_rooms_active", "Rooms currently held by the server.")
+GAMES_PLAYING = Gauge("cheat_games_playing", "Rooms with a game in progress.")
+PLAYERS_CONNECTED = Gauge("cheat_players_connected", "Human players with an open websocket.")
+TURN_SECONDS = Histogram(
+    "cheat_turn_seconds",
+    "Time from the start of a turn to the discard that ends it.",
+    ("player",),  # human or bot
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+ACTION_SECONDS = Histogram("cheat_action_seconds", "Time the game loop spends applying one action.", ("kind",))
+BROADCAST_SECONDS = Histogram("cheat_broadcast_seconds", "Time to fan a state change out to every player.")
+BROADCAST_RECIPIENTS = Histogram(
+    "cheat_broadcast_recipients",
+    "Human connections each state change is sent to.",
+    buckets=(1, 2, 3, 4, 6, 8),
+)
+SPECULATIONS = Counter("cheat_bot_speculations", "Discards a bot worked out ahead of its turn, by whether they were used.", ("outcome",))
+GEMINI_SECONDS = Histogram("gemini_request_seconds", "Latency of Gemini calls, including queueing for a slot.", ("outcome",))
+GEMINI_ERRORS = Counter("gemini_errors", "Gemini calls that failed, by reason.", ("reason",))
+GEMINI_CALLS = Counter("gemini_calls", "Requests sent to the model, by outcome. A batch of decisions counts once.", ("outcome",))
+GEMINI_BATCH_SIZE = Histogram(
+    "gemini_batch_size",
+    "Decisions answered by each request sent to the model.",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16),
+)
+GEMINI_COALESCED = Counter("gemini_coalesced", "Decisions that joined an identical request already queued or in flight.")
+GEMINI_QUEUED = Gauge("gemini_queued", "Decisions waiting for a request to the model, by priority.", ("priority",))
+LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a sleeping task.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Sleeps for `interval` over and over, recording how much longer each sleep took."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
@@ -1,99 +1,234 @@
 import asyncio
-import json
-from abc import ABC, abstractmethod
-from starlette.websockets import WebSocket
-from card import Card
-from gemini import analyze_bluff, move
+import hashlib
+import hmac
+import secrets
+import time
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+from actions import Action, ActionKind, InvalidAction, parse_cards
+from card import Card, Hand
+from gemini import Urgency, urgency
+from logs import get_logger
+from metrics import SPECULATIONS
+from strategy import BotStrategy, HeuristicStrategy, default_strategy, next_rank
+from wire import JSON, JsonCodec, MsgpackCodec, receive, send_frame
 
 
-class Player(ABC):
+log = get_logger("cheat.player")
+
+
+def secret_digest(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+class Player:
     def __init__(self, name: str) -> None:
         self.name = name
-        self.hand: list[Card] = []
+        self.hand = Hand()
         self.last_discard = []
         self.cheated = False
+        # Set by Cheat.join, actions are queued on the room's game loop.
+        self.room = None
 
-    @abstractmethod
-    async def play_turn(self) -> list[Card]:
-        pass
+    def submit(self, kind: ActionKind, cards: list[Card], turn: int) -> None:
+        if self.room is not None:
+            self.room.submit(Action(self, kind, cards, turn))
 
-    @abstractmethod
-    async def play_turn_or_callout(self) -> "list[Card] | Player":
-        pass
-
-    @abstractmethod
-    async def callout(self) -> "Player":
-        pass
+    async def rejected(self, action: Action, error: InvalidAction) -> None:
+        """Called by the game loop when one of this player's actions is refused."""
 
 
 class HumanPlayer(Player):
-    def __init__(self, websocket: WebSocket, name: str) -> None:
+    def __init__(self, websocket: WebSocket | None, name: str, codec: JsonCodec | MsgpackCodec = JSON) -> None:
         super().__init__(name)
         self.websocket = websocket
+        # How messages to this client are encoded, chosen when it connects.
+        self.codec = codec
         self.ready = False
+        # What this client was last sent, so state broadcasts can be deltas.
+        self.sent_pov: dict | None = None
+        self.sent_mask = 0
+        self.sent_version = 0
+        # Lets a dropped client reclaim this seat with a new connection. Only
+        # the digest is logged, so seats rebuilt from the event log have no secret.
+        self.secret: str | None = secrets.token_urlsafe(16)
+        self.secret_hash = secret_digest(self.secret)
+        self.disconnected_at = 0.0
+
+    @property
+    def session(self) -> str:
+        # Prefixed with the room so cluster.py can route a reconnect to its worker.
+        return f"{self.room.id}.{self.secret}"
+
+    def owns_session(self, session: str) -> bool:
+        room_id, _, secret = session.rpartition(".")
+        return room_id == self.room.id and hmac.compare_digest(secret_digest(secret), self.secret_hash)
 
     def ready_up(self) -> None:
         self.ready = True
 
-    async def play_turn(self) -> list[Card]:
-        while True:
-            try:
-                data = await self.websocket.receive_json()
-                if "discard" in data:
-                    discard: list[str] = data.get("discard")
-                    self.last_discard = [Card.from_str(s) for s in discard]
-                    return self.last_discard
-            except Exception as e:
-                print(e, f"try again, {self.name}")
+    def resync(self) -> None:
+        """Makes the next state broadcast a full snapshot."""
+        self.sent_pov = None
+
+    def attach(self, websocket: WebSocket, codec: JsonCodec | MsgpackCodec = JSON) -> None:
+        """Moves the seat onto a new connection; it gets a full snapshot next."""
+        self.websocket = websocket
+        self.codec = codec
+        self.resync()
+
+    def detach(self) -> None:
+        self.disconnected_at = time.monotonic()
+
+    @property
+    def connected(self) -> bool:
+        # Seats recovered from the event log have no connection until the player comes back.
+        return self.websocket is not None and self.websocket.client_state != WebSocketState.DISCONNECTED
+
+    async def send(self, message: dict) -> None:
+        await send_frame(self.websocket, self.codec.encode(message))
+
+    async def send_frame(self, frame: str | bytes) -> None:
+        """Sends a message already encoded with this player's codec."""
+        await send_frame(self.websocket, frame)
+
+    async def send_error(self, error: InvalidAction, turn: int) -> None:
+        try:
+            await self.send({**error.to_message(), "turn": turn})
+        except Exception as e:
+            log.debug("couldn't send error", fields={"player": self.name, "error": e})
 
-    async def play_turn_or_callout(self) -> list[Card] | Player:
+    async def rejected(self, action: Action, error: InvalidAction) -> None:
+        await self.send_error(error, action.turn)
+
+    async def read_actions(self) -> None:
+        """Feeds every frame from this connection into the room until it closes."""
         while True:
             try:
-                data = await self.websocket.receive_json()
+                data = await receive(self.websocket)
                 if "discard" in data:
-                    discard: list[str] = data.get("discard")
-                    self.last_discard = [Card.from_str(s) for s in discard]
-                    return self.last_discard
+                    try:
+                        cards = parse_cards(data.get("discard"))
+                    except InvalidAction as error:
+                        await self.send_error(error, self.room.turn)
+                        continue
+                    self.submit(ActionKind.DISCARD, cards, self.room.turn)
                 elif "callout" in data:
                     callout: bool = data.get("callout")
                     if callout:
-                        return self
-            except Exception as e:
-                print(e, f"try again, {self.name}")
-
-    async def callout(self) -> Player:
-        while True:
-            try:
-                data = await self.websocket.receive_json()
-                if "callout" in data:
-                    callout: bool = data.get("callout")
-                    if callout:
-                        return self
+                        self.submit(ActionKind.CALLOUT, [], self.room.turn)
+            except WebSocketDisconnect:
+                raise
             except Exception as e:
-                print(e, f"try again, {self.name}")
+                log.warning("ignored bad frame", fields={"player": self.name, "error": e})
 
 
 class BotPlayer(Player):
-    def __init__(self) -> None:
-        super().__init__("otis")
+    def __init__(self, strategy: BotStrategy | None = None, name: str = "otis") -> None:
+        super().__init__(name)
+        self.ready = True
+        self.strategy = strategy if strategy is not None else default_strategy()
+        # Plays instead when the strategy fails or comes up with an invalid discard.
+        self.fallback = HeuristicStrategy()
         self.pov_board_state = None
-
-    async def play_turn(self) -> list[Card]:
-        response = move(
-            list(map(lambda c: str(c), self.hand)), json.dumps(self.pov_board_state)
-        )
-        return [Card.from_str(c) for c in response.get("CardsToPlay")]
-
-    async def play_turn_or_callout(self) -> list[Card] | Player:
-        return await self.play_turn()
-
-    async def callout(self) -> Player:
-        response = analyze_bluff(json.dumps(self.pov_board_state), "", "")
-        print(response.get("Reasoning"))
-        if response.get("Bluffing"):
-            return self
-        while True:
-            await asyncio.sleep(1)
+        self.decision: asyncio.Task | None = None
+        # ((hand mask, rank) it assumed, its urgency, task working out the discard)
+        self.speculation: tuple[tuple[int, int], Urgency, asyncio.Task] | None = None
 
     async def update_pov(self, pov) -> None:
         self.pov_board_state = pov
+        # Whatever was being worked out for the previous state no longer applies.
+        self.cancel_decision()
+        if pov["own-turn"] or pov["can-callout"]:
+            self.decision = asyncio.create_task(self.decide(pov, self.room.turn))
+        if self.strategy.speculative and self.next_in_order(pov):
+            self.speculate(pov)
+
+    def cancel_decision(self) -> None:
+        if self.decision is not None and not self.decision.done():
+            self.decision.cancel()
+        self.decision = None
+
+    def next_in_order(self, pov: dict) -> bool:
+        room = self.room
+        return not pov["own-turn"] and room.players[(room.current_player_index + 1) % len(room.players)] is self
+
+    def speculate(self, pov: dict) -> None:
+        """
+        Starts on the discard for the bot's coming turn while the current
+        player is still deciding, assuming its hand is unchanged and the rank
+        moves on by one. A callout before then changes one or the other.
+        """
+        rank = next_rank(pov["current_rank"])
+        key = (self.hand.mask, rank)
+        if self.speculation is not None and self.speculation[0] == key:
+            return
+        self.cancel_speculation()
+        predicted = {
+            **pov,
+            "own-turn": True,
+            "can-callout": False,
+            "waiting-for": self.name,
+            "previous-player": pov["waiting-for"],
+            "current_rank": rank,
+        }
+        # Requests it makes wait behind any that are holding up a turn.
+        speculative = Urgency(blocking=False)
+        token = urgency.set(speculative)
+        try:
+            task = asyncio.create_task(self.strategy.choose_discard(self.hand.copy(), predicted))
+        finally:
+            urgency.reset(token)
+        self.speculation = (key, speculative, task)
+
+    def cancel_speculation(self) -> None:
+        if self.speculation is not None:
+            self.speculation[2].cancel()
+        self.speculation = None
+
+    async def take_speculation(self, pov: dict) -> list[Card] | None:
+        """The speculated discard if it was made for this hand and rank."""
+        if self.speculation is None:
+            return None
+        key, speculative, task = self.speculation
+        self.speculation = None
+        if key != (self.hand.mask, pov["current_rank"]):
+            task.cancel()
+            SPECULATIONS.labels("miss").inc()
+            return None
+        # The turn is now waiting on it.
+        speculative.blocking = True
+        try:
+            cards = await task
+        except Exception:
+            SPECULATIONS.labels("failed").inc()
+            return None
+        SPECULATIONS.labels("hit").inc()
+        return cards
+
+    async def decide(self, pov: dict, turn: int) -> None:
+        if pov["own-turn"]:
+            cards = await self.take_speculation(pov)
+            if cards is None:
+                try:
+                    cards = await self.strategy.choose_discard(self.hand, pov)
+                except Exception as e:
+                    log.warning("strategy failed, using fallback", fields={"player": self.name, "error": e})
+                    cards = await self.fallback.choose_discard(self.hand, pov)
+            self.submit(ActionKind.DISCARD, cards, turn)
+        else:
+            try:
+                callout = await self.strategy.should_callout(pov)
+            except Exception as e:
+                log.warning("strategy failed, using fallback", fields={"player": self.name, "error": e})
+                callout = await self.fallback.should_callout(pov)
+            if callout:
+                self.submit(ActionKind.CALLOUT, [], turn)
+
+    async def rejected(self, action: Action, error: InvalidAction) -> None:
+        # Stale decisions are expected when the state moves on; anything else
+        # means the strategy made up or misread cards.
+        if error.code == "out-of-turn" or not self.hand:
+            return
+        log.warning("strategy made an invalid move, using fallback", fields={"player": self.name, "error": error.code})
+        cards = await self.fallback.choose_discard(self.hand, self.pov_board_state)
+        self.submit(ActionKind.DISCARD, cards, action.turn)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import time
+import uuid
+
+from cheat import Cheat
+from cluster import COORDINATOR_ENV, WORKER_INDEX_ENV, WORKERS_ENV, shard_for
+from eventlog import EventStore, recover
+from logs import get_logger
+from player import HumanPlayer
+from telemetry import telemetry
+
+# Rooms are only ever touched from the event loop, so a plain dict is enough.
+MAX_ROOMS = int(os.getenv("CHEAT_MAX_ROOMS", "256"))
+# Seconds without any game activity before a room is considered dead.
+ROOM_IDLE_TIMEOUT = float(os.getenv("CHEAT_ROOM_IDLE_TIMEOUT", "900"))
+# Seconds an empty lobby is kept around so its creator has time to connect.
+EMPTY_ROOM_GRACE = float(os.getenv("CHEAT_EMPTY_ROOM_GRACE", "60"))
+REAP_INTERVAL = 10
+# Set by cluster.py when this process is one of several workers.
+WORKER_INDEX = int(os.getenv(WORKER_INDEX_ENV, "0"))
+WORKERS = int(os.getenv(WORKERS_ENV, "1"))
+COORDINATOR = os.getenv(COORDINATOR_ENV)
+
+
+log = get_logger("cheat.rooms")
+
+
+class RoomLimitReached(Exception):
+    pass
+
+
+class RoomManager:
+    def __init__(self, max_rooms: int = MAX_ROOMS, events: EventStore | None = None) -> None:
+        self.max_rooms = max_rooms
+        self.rooms: dict[str, Cheat] = {}
+        self.events = events
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def get(self, room_id: str) -> Cheat | None:
+        return self.rooms.get(room_id)
+
+    def create(self, room_id: str | None = None) -> Cheat:
+        if len(self.rooms) >= self.max_rooms:
+            raise RoomLimitReached(f"room limit of {self.max_rooms} reached")
+        if room_id is None:
+            room_id = uuid.uuid4().hex[:8]
+            # Only hand out ids the router will send back to this worker.
+            while shard_for(room_id, WORKERS) != WORKER_INDEX:
+                room_id = uuid.uuid4().hex[:8]
+        if room_id in self.rooms:
+            raise ValueError(f"room {room_id} already exists")
+        room = Cheat(room_id)
+        if self.events is not None:
+            room.events = self.events.open(room_id)
+            room.record({"e": "room", "bot_count": room.bot_count})
+        self.rooms[room_id] = room
+        return room
+
+    def recover(self) -> list[str]:
+        """Restarts the games this worker's event logs say were still running."""
+        if self.events is None:
+            return []
+        recovered = recover(self.events, lambda room_id: shard_for(room_id, WORKERS) == WORKER_INDEX)
+        for room in recovered:
+            self.rooms[room.id] = room
+            room.game_task = asyncio.create_task(room.resume_game())
+            log.info("recovered room", fields={"room": room.id, "turn": room.turn})
+        return [room.id for room in recovered]
+
+    def get_or_create(self, room_id: str) -> Cheat:
+        room = self.get(room_id)
+        if room is None:
+            room = self.create(room_id)
+        return room
+
+    def find_open(self) -> Cheat:
+        """Returns a lobby that is still accepting players, creating one if needed."""
+        for room in self.rooms.values():
+            if room.joinable:
+                return room
+        return self.create()
+
+    def find_session(self, session: str) -> HumanPlayer | None:
+        for room in self.rooms.values():
+            player = room.find_session(session)
+            if player is not None:
+                return player
+        return None
+
+    def summaries(self) -> list[dict]:
+        return [room.summary() for room in self.rooms.values()]
+
+    def remove(self, room_id: str) -> None:
+        room = self.rooms.pop(room_id, None)
+        if room is None:
+            return
+        if room.game_task is not None:
+            room.game_task.cancel()
+        telemetry.drop_room(room_id)
+        if self.events is not None:
+            room.record({"e": "closed"})
+            self.events.close(room_id)
+
+    def reap(self, now: float | None = None) -> list[str]:
+        """Drops finished, abandoned and idle rooms. Returns the ids removed."""
+        if now is None:
+            now = time.monotonic()
+        dead = [
+            room_id
+            for room_id, room in self.rooms.items()
+            if room.finished
+            or room.abandoned(now, EMPTY_ROOM_GRACE)
+            or now - room.last_activity > ROOM_IDLE_TIMEOUT
+        ]
+        for room_id in dead:
+            self.remove(room_id)
+        return dead
+
+    async def reaper(self) -> None:
+        while True:
+            await asyncio.sleep(REAP_INTERVAL)
+            for room_id in self.reap():
+                log.info("reaped room", fields={"room": room_id})
@@ -0,0 +1,199 @@
+"""
+Headless driver for the Cheat engine. Plays full games between local players
+with no sockets or model calls and reports throughput, per-turn latency and
+allocations for the engine's hot paths.
+
+    python simulate.py --games 2000 --players 4 --bots random
+
+With --event-log DIR every game is also recorded, for eventlog.py to replay.
+--bots gemini plays through gemini.py's backend: record a run once with
+GEMINI_BACKEND=record, then replay it offline with GEMINI_BACKEND=replay and
+GEMINI_REPLAY_LATENCY to see how the game loop copes with a slow model.
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import time
+import tracemalloc
+from collections import defaultdict
+
+from cheat import Cheat
+from eventlog import EventStore
+from card import Card
+from player import BotPlayer
+from strategy import BotStrategy, GeminiStrategy, HeuristicStrategy
+
+TIMED_ASYNC = ("discard", "callout")
+TIMED_SYNC = ("shared_pov", "pov_data", "create_hands")
+
+
+class RandomStrategy(BotStrategy):
+    """Discards one to four random cards and calls cheat at a fixed rate."""
+
+    def __init__(self, rng: random.Random, callout_rate: float = 0.1) -> None:
+        self.rng = rng
+        self.callout_rate = callout_rate
+
+    async def choose_discard(self, hand: list[Card], pov: dict) -> list[Card]:
+        cards = list(hand)
+        if not cards:
+            return []
+        return self.rng.sample(cards, self.rng.randint(1, min(4, len(cards))))
+
+    async def should_callout(self, pov: dict) -> bool:
+        return self.rng.random() < self.callout_rate
+
+
+class TurnLimitReached(Exception):
+    pass
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.timings: dict[str, list[float]] = defaultdict(list)
+        self.allocations: dict[str, list[int]] = defaultdict(list)
+        self.turn_times: list[float] = []
+        self.games = 0
+        self.unfinished = 0
+        self.turns = 0
+
+    def record(self, name: str, elapsed: float, allocated: int | None) -> None:
+        self.timings[name].append(elapsed)
+        if allocated is not None:
+            self.allocations[name].append(allocated)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure_start(trace: bool) -> tuple[float, int]:
+    if trace:
+        tracemalloc.reset_peak()
+        return time.perf_counter(), tracemalloc.get_traced_memory()[0]
+    return time.perf_counter(), 0
+
+
+def measure_end(started: tuple[float, int], trace: bool) -> tuple[float, int | None]:
+    elapsed = time.perf_counter() - started[0]
+    if trace:
+        return elapsed, tracemalloc.get_traced_memory()[1] - started[1]
+    return elapsed, None
+
+
+def instrument(room: Cheat, stats: Stats, max_turns: int, trace: bool) -> None:
+    """Wraps the room's hot paths so every call is timed (and traced)."""
+    last_turn = [time.perf_counter()]
+    game_turns = [0]
+
+    for name in TIMED_ASYNC:
+        original = getattr(room, name)
+
+        async def timed(*args, _original=original, _name=name):
+            started = measure_start(trace)
+            await _original(*args)
+            stats.record(_name, *measure_end(started, trace))
+            if _name == "discard":
+                now = time.perf_counter()
+                stats.turn_times.append(now - last_turn[0])
+                last_turn[0] = now
+                stats.turns += 1
+                game_turns[0] += 1
+                if game_turns[0] >= max_turns:
+                    raise TurnLimitReached()
+
+        setattr(room, name, timed)
+
+    for name in TIMED_SYNC:
+        original = getattr(room, name)
+
+        def timed(*args, _original=original, _name=name, **kwargs):
+            started = measure_start(trace)
+            result = _original(*args, **kwargs)
+            stats.record(_name, *measure_end(started, trace))
+            return result
+
+        setattr(room, name, timed)
+
+
+def make_players(kind: str, count: int, rng: random.Random) -> list[BotPlayer]:
+    if kind == "heuristic":
+        return [BotPlayer(HeuristicStrategy(), name=f"bot{i}") for i in range(count)]
+    if kind == "gemini":
+        return [BotPlayer(GeminiStrategy(), name=f"bot{i}") for i in range(count)]
+    return [BotPlayer(RandomStrategy(rng), name=f"bot{i}") for i in range(count)]
+
+
+async def play_games(
+    games: int, players: int, kind: str, seed: int, max_turns: int, trace: bool, events: EventStore | None = None
+) -> Stats:
+    stats = Stats()
+    rng = random.Random(seed)
+    random.seed(seed)
+    for game in range(games):
+        room = Cheat(f"sim{game}", bot_count=0)
+        if events is not None:
+            room.events = events.open(room.id)
+        for player in make_players(kind, players, rng):
+            room.join(player)
+        instrument(room, stats, max_turns, trace)
+        try:
+            await room.start()
+        except TurnLimitReached:
+            stats.unfinished += 1
+        stats.games += 1
+        if events is not None:
+            events.close(room.id)
+            await events.flush()
+    return stats
+
+
+def run(
+    games: int, players: int, kind: str, seed: int, max_turns: int, alloc_games: int, event_log: str | None = None
+) -> None:
+    events = EventStore(event_log) if event_log else None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        stats = asyncio.run(play_games(games, players, kind, seed, max_turns, trace=False, events=events))
+        elapsed = time.perf_counter() - started
+
+        tracemalloc.start()
+        alloc_stats = asyncio.run(play_games(alloc_games, players, kind, seed, max_turns, trace=True))
+        tracemalloc.stop()
+
+    print(
+        f"{stats.games} games ({stats.unfinished} hit the {max_turns} turn limit), "
+        f"{stats.turns} turns in {elapsed:.2f}s"
+    )
+    print(f"{stats.games / elapsed:,.0f} games/s, {stats.turns / elapsed:,.0f} turns/s")
+    print(
+        f"turn latency p50 {percentile(stats.turn_times, 0.5) * 1e6:,.1f}us "
+        f"p99 {percentile(stats.turn_times, 0.99) * 1e6:,.1f}us"
+    )
+    print(f"{'operation':<14}{'calls':>10}{'p50 us':>10}{'p99 us':>10}{'peak B p50':>14}")
+    for name in TIMED_ASYNC + TIMED_SYNC:
+        timings = stats.timings[name]
+        allocations = alloc_stats.allocations[name]
+        print(
+            f"{name:<14}{len(timings):>10}"
+            f"{percentile(timings, 0.5) * 1e6:>10.1f}{percentile(timings, 0.99) * 1e6:>10.1f}"
+            f"{percentile(allocations, 0.5):>14,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--bots", choices=("random", "heuristic", "gemini"), default="random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-turns", type=int, default=1000)
+    parser.add_argument("--alloc-games", type=int, default=50, help="games replayed under tracemalloc")
+    parser.add_argument("--event-log", help="directory to record every game's event log in")
+    args = parser.parse_args()
+    run(args.games, args.players, args.bots, args.seed, args.max_turns, args.alloc_games, args.event_log)
@@ -0,0 +1,183 @@
+import os
+from abc import ABC, abstractmethod
+from math import comb
+
+from card import Card
+from gemini import analyze_bluff, move
+from logs import get_logger
+from telemetry import telemetry
+
+log = get_logger("cheat.strategy")
+
+RANKS = 13
+SUIT_COUNT = 4
+DECK_SIZE = RANKS * SUIT_COUNT
+
+# Call cheat once the estimated bluff probability reaches this value. A
+# callout sends the rank back to aces, so calling on hunches keeps the high
+# ranks from ever coming round and games from ending.
+CALLOUT_THRESHOLD = 0.95
+# How often a player bluffs by choice rather than for lack of the rank, with
+# any number of cards.
+BLUFF_PRIOR = 0.1
+# Estimates within this distance of the threshold are handed to the tie-breaker.
+TIE_BAND = 0.04
+
+
+def previous_rank(rank: int) -> int:
+    return RANKS if rank == 1 else rank - 1
+
+
+def next_rank(rank: int) -> int:
+    return 1 if rank == RANKS else rank + 1
+
+
+def pick_discard(hand: list[Card], rank: int) -> list[Card]:
+    """
+    Plays every card of the required rank. Without one, bluffs with the single
+    card whose rank comes round again last, keeping the cards needed soonest.
+    """
+    matching = [c for c in hand if c.value == rank]
+    if matching:
+        return matching
+    if not hand:
+        return []
+    return [max(hand, key=lambda c: (c.value - rank) % RANKS)]
+
+
+def describe_claim(pov: dict) -> str:
+    previous = pov.get("previous-player")
+    claimed = next(
+        (p["last-discard"] for p in pov["player_info"] if p["name"] == previous), 0
+    )
+    return f"{previous} played {claimed} cards claiming rank {previous_rank(pov['current_rank'])}"
+
+
+def hypergeometric(population: int, successes: int, draws: int, k: int) -> float:
+    """P(X == k) for X ~ Hypergeometric(population, successes, draws)."""
+    total = comb(population, draws)
+    if total == 0:
+        return 0.0
+    return comb(successes, k) * comb(population - successes, draws - k) / total
+
+
+def bluff_probability(pov: dict) -> float:
+    """
+    Estimates how likely the last discard was a bluff, given the claim, by
+    counting cards: the rank that was claimed, how many of it we hold, and
+    how many cards the previous player had to pick the claim from.
+    """
+    previous = next(
+        (p for p in pov["player_info"] if p["name"] == pov.get("previous-player")), None
+    )
+    if previous is None:
+        return 0.0
+    rank = previous_rank(pov["current_rank"])
+    held = sum(1 for s in pov["hand"] if int(s[1:]) == rank)
+    return claim_bluff_probability(previous["last-discard"], held, len(pov["hand"]), previous["cards"])
+
+
+def claim_bluff_probability(claimed: int, held: int, hand_size: int, previous_cards: int) -> float:
+    """
+    bluff_probability from the counts alone: cards claimed, how many of the
+    claimed rank we hold, our hand size and the claimer's hand size now.
+
+    The claimer is assumed to play like pick_discard, every card of the rank
+    they hold or one card if they hold none, except for bluffing by choice
+    with 1 to 4 cards BLUFF_PRIOR of the time. An honest claim of k cards
+    needs exactly k of the rank in their hand, so honest multi-card claims
+    are not mistaken for bluffs just because such hands are uncommon.
+    """
+    if claimed == 0:
+        return 0.0
+    available = SUIT_COUNT - held
+    if claimed > available:
+        return 1.0
+
+    # Every card we can't see is equally likely to have been in their hand.
+    unseen = DECK_SIZE - hand_size
+    hand_before = previous_cards + claimed
+    honest = (1 - BLUFF_PRIOR) * hypergeometric(unseen, available, hand_before, claimed)
+    bluff = BLUFF_PRIOR / SUIT_COUNT
+    if claimed == 1:
+        bluff += (1 - BLUFF_PRIOR) * hypergeometric(unseen, available, hand_before, 0)
+    return bluff / (bluff + honest)
+
+
+class BotStrategy(ABC):
+    # Slow strategies work out the bot's discard ahead of its turn, see BotPlayer.speculate.
+    speculative = False
+    # Set by bind(), for reading the room's telemetry.
+    room_id: str | None = None
+
+    def bind(self, room_id: str) -> None:
+        """Called by Cheat.join when the bot sits down in a room."""
+        self.room_id = room_id
+
+    @abstractmethod
+    async def choose_discard(self, hand: list[Card], pov: dict) -> list[Card]:
+        pass
+
+    @abstractmethod
+    async def should_callout(self, pov: dict) -> bool:
+        pass
+
+
+class GeminiUnavailable(Exception):
+    pass
+
+
+def checked(response: dict) -> dict:
+    # Failed requests come back as {"Error": ...}; raising lets BotPlayer fall
+    # back to its local strategy instead of treating the error as a decision.
+    if "Error" in response:
+        raise GeminiUnavailable(response["Error"])
+    return response
+
+
+class GeminiStrategy(BotStrategy):
+    speculative = True
+
+    async def choose_discard(self, hand: list[Card], pov: dict) -> list[Card]:
+        response = checked(await move(list(map(lambda c: str(c), hand)), pov))
+        return [Card.from_str(c) for c in response.get("CardsToPlay") or []]
+
+    async def should_callout(self, pov: dict) -> bool:
+        emotion_data = telemetry.describe(self.room_id, pov.get("previous-player"))
+        response = checked(await analyze_bluff(describe_claim(pov), pov, emotion_data))
+        log.debug("bluff analysis", fields={"reasoning": response.get("Reasoning")})
+        return bool(response.get("Bluffing"))
+
+
+class HeuristicStrategy(BotStrategy):
+    """
+    Local card-counting bot. Decides without any network calls; a tie-breaker
+    strategy, if given, is only consulted for callouts too close to call.
+    """
+
+    def __init__(self, tie_breaker: BotStrategy | None = None) -> None:
+        self.tie_breaker = tie_breaker
+
+    def bind(self, room_id: str) -> None:
+        super().bind(room_id)
+        if self.tie_breaker is not None:
+            self.tie_breaker.bind(room_id)
+
+    async def choose_discard(self, hand: list[Card], pov: dict) -> list[Card]:
+        return pick_discard(hand, pov["current_rank"])
+
+    async def should_callout(self, pov: dict) -> bool:
+        p = bluff_probability(pov)
+        if self.tie_breaker is not None and abs(p - CALLOUT_THRESHOLD) < TIE_BAND:
+            return await self.tie_breaker.should_callout(pov)
+        return p >= CALLOUT_THRESHOLD
+
+
+def default_strategy() -> BotStrategy:
+    """Picks the bot engine from CHEAT_BOT_STRATEGY: gemini, heuristic or hybrid."""
+    name = os.getenv("CHEAT_BOT_STRATEGY", "gemini")
+    if name == "heuristic":
+        return HeuristicStrategy()
+    if name == "hybrid":
+        return HeuristicStrategy(tie_breaker=GeminiStrategy())
+    return GeminiStrategy()
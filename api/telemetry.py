@@ -0,0 +1,165 @@
+import math
+import os
+import re
+import time
+from collections import deque
+
+from emotion import EMOTIONS, EmotionHistory, describe_features
+
+# Samples kept per player; at a few samples a second this covers the last minute or so.
+TELEMETRY_HISTORY = int(os.getenv("CHEAT_TELEMETRY_HISTORY", "256"))
+# How far back the bluff prompt looks.
+PROMPT_WINDOW = 15.0
+# Speech this long after a discard still counts as said during that turn.
+SPEECH_GRACE = 1.0
+# The ages describe() writes, which differ from run to run for the same game;
+# gemini.py leaves them out of its request keys.
+AGE_PATTERN = re.compile(r"\b\d+s ago\b")
+
+
+class InvalidSample(ValueError):
+    """A telemetry sample the server can't use; it is logged and skipped."""
+
+
+def number(value, field: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise InvalidSample(f"{field} must be a number")
+    return float(value)
+
+
+def parse_sample(sample) -> dict:
+    """
+    Checks a sample from a vision client and returns a copy with numeric
+    fields as floats, so a bad one can't break the buffer or the prompts.
+    """
+    if not isinstance(sample, dict):
+        raise InvalidSample("sample must be an object")
+    kind = sample.get("kind")
+    parsed = {**sample, "t": number(sample.get("t"), "t")}
+    if kind == "emotion":
+        scores = sample.get("scores")
+        if not isinstance(scores, list) or len(scores) != len(EMOTIONS):
+            raise InvalidSample(f"scores must be a list of {len(EMOTIONS)} numbers")
+        parsed["scores"] = [number(score, "scores") for score in scores]
+        parsed["confidence"] = number(sample.get("confidence", 1.0), "confidence")
+    elif kind in ("speech", "speech-partial"):
+        if not isinstance(sample.get("text", ""), str):
+            raise InvalidSample("text must be a string")
+        utterance = sample.get("utterance", -1)
+        if isinstance(utterance, bool) or not isinstance(utterance, int):
+            raise InvalidSample("utterance must be an integer")
+        words = sample.get("words", [])
+        if not isinstance(words, list):
+            raise InvalidSample("words must be a list")
+        parsed["words"] = []
+        for word in words:
+            if not isinstance(word, dict) or not isinstance(word.get("word"), str):
+                raise InvalidSample("each word needs a word string")
+            parsed["words"].append(
+                {"word": word["word"], "start": number(word.get("start"), "start"), "end": number(word.get("end"), "end")}
+            )
+    else:
+        raise InvalidSample(f"unknown kind {kind!r}")
+    return parsed
+
+
+class TelemetryBuffer:
+    """
+    Samples from one player's vision client: emotion readings go into a
+    numeric EmotionHistory, speech into a ring buffer of recent samples.
+    """
+
+    def __init__(self, maxlen: int = TELEMETRY_HISTORY) -> None:
+        self.samples: deque[dict] = deque(maxlen=maxlen)
+        self.emotions = EmotionHistory()
+        # (start, end) server time of this player's most recent turn.
+        self.last_turn: tuple[float, float] | None = None
+        # Smallest (server - client) time seen; client times plus this are
+        # server times, give or take the fastest delivery.
+        self.clock_offset: float | None = None
+
+    def add(self, sample) -> None:
+        """Stores a sample from the client, raising InvalidSample if it is malformed."""
+        sample = parse_sample(sample)
+        # Server receive time, so samples line up with game events on one clock.
+        sample["received"] = received = time.time()
+        offset = received - sample["t"]
+        if self.clock_offset is None or offset < self.clock_offset:
+            self.clock_offset = offset
+        if sample.get("kind") == "emotion":
+            self.emotions.push(sample["t"] + self.clock_offset, sample["scores"], sample["confidence"])
+        else:
+            self.samples.append(sample)
+
+    def since(self, t: float) -> list[dict]:
+        return [s for s in self.samples if s["received"] >= t]
+
+    def mark_turn(self, started: float, ended: float) -> None:
+        self.last_turn = (started, ended)
+
+    def words_between(self, started: float, ended: float) -> list[str]:
+        """
+        Words spoken between two server times. Word times come from the
+        client's clock and are shifted by the estimated clock offset.
+        A final result replaces the partials of its utterance.
+        """
+        utterances: dict[int, tuple[str, list[str]]] = {}
+        for sample in self.samples:
+            kind = sample.get("kind")
+            if kind not in ("speech", "speech-partial"):
+                continue
+            utterance = sample.get("utterance", -1)
+            if kind == "speech-partial" and utterances.get(utterance, ("",))[0] == "speech":
+                continue
+            words = [
+                w["word"]
+                for w in sample.get("words", [])
+                if started <= w["start"] + self.clock_offset and w["end"] + self.clock_offset <= ended
+            ]
+            utterances[utterance] = (kind, words)
+        return [word for _, words in utterances.values() for word in words]
+
+
+class TelemetryHub:
+    """Buffers for every seat, by (room id, player name); names are only unique within a room."""
+
+    def __init__(self) -> None:
+        self.buffers: dict[tuple[str, str], TelemetryBuffer] = {}
+
+    def buffer(self, room_id: str, player_name: str) -> TelemetryBuffer:
+        buffer = self.buffers.get((room_id, player_name))
+        if buffer is None:
+            buffer = self.buffers[(room_id, player_name)] = TelemetryBuffer()
+        return buffer
+
+    def drop_room(self, room_id: str) -> None:
+        for key in [key for key in self.buffers if key[0] == room_id]:
+            del self.buffers[key]
+
+    def describe(self, room_id: str | None, player_name: str, window: float = PROMPT_WINDOW) -> str:
+        """Recent samples for a player as prompt text, oldest first."""
+        buffer = self.buffers.get((room_id, player_name))
+        if buffer is None:
+            return ""
+        now = time.time()
+        lines = []
+        for sample in buffer.since(now - window):
+            age = int(now - sample["received"])
+            if sample.get("kind") == "speech":
+                lines.append(f"{age}s ago said: {sample.get('text', '')}")
+        if buffer.last_turn is not None:
+            started, ended = buffer.last_turn
+            features = buffer.emotions.features(ended)
+            if features is not None:
+                lines.append(describe_features(features))
+            # Allow for speech that was still being recognised as they played.
+            words = buffer.words_between(started, ended + SPEECH_GRACE)
+            if words:
+                lines.append(f"During their last discard they said: {' '.join(words)}")
+        return "\n".join(lines)
+
+    def mark_turn(self, room_id: str, player_name: str, started: float, ended: float) -> None:
+        self.buffer(room_id, player_name).mark_turn(started, ended)
+
+
+telemetry = TelemetryHub()
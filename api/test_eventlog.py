@@ -0,0 +1,64 @@
+import asyncio
+
+import cheat
+from cheat import Cheat
+from eventlog import EventStore, load_room
+from player import HumanPlayer
+from wire import loads
+
+
+def play(room: Cheat, actions: int) -> None:
+    async def run() -> None:
+        for i in range(actions):
+            # Every third action a callout, so callouts land on multiples of
+            # SNAPSHOT_EVERY as often as discards do.
+            if i % 3 == 2 and room.deck:
+                await room.callout(room.current_player)
+            else:
+                await room.discard([next(iter(room.current_player.hand))])
+
+    asyncio.run(run())
+
+
+def logged_room(tmp_path, monkeypatch) -> tuple[Cheat, EventStore]:
+    monkeypatch.setattr(cheat, "SNAPSHOT_EVERY", 5)
+    store = EventStore(str(tmp_path))
+    room = Cheat("snapshots", bot_count=0)
+    room.events = store.open(room.id)
+    for name in ("a", "b", "c"):
+        room.join(HumanPlayer(None, name))
+    room.record({"e": "deal", "seed": 1})
+    room.deal(1)
+    return room, store
+
+
+def discards_between_snapshots(events: list[dict]) -> list[int]:
+    gaps, discards = [], 0
+    for event in events:
+        if event["e"] == "discard":
+            discards += 1
+        elif event["e"] == "snapshot":
+            gaps.append(discards)
+            discards = 0
+    return gaps + [discards]
+
+
+def test_snapshots_are_spaced_by_discards_not_turns(tmp_path, monkeypatch):
+    room, _ = logged_room(tmp_path, monkeypatch)
+    play(room, 40)
+    events = [loads(line) for line in room.events.pending]
+
+    assert any(event["e"] == "callout" for event in events)
+    *full, last = discards_between_snapshots(events)
+    assert full and all(gap == 5 for gap in full)
+    assert last < 5
+
+
+def test_recovered_room_keeps_counting_from_the_last_snapshot(tmp_path, monkeypatch):
+    room, store = logged_room(tmp_path, monkeypatch)
+    play(room, 20)
+    room.events.write(room.events.take())
+
+    recovered = load_room(store.path(room.id), room.id)
+    assert recovered.discards_since_snapshot == room.discards_since_snapshot
+    assert recovered.state() == room.state()
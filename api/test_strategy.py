@@ -0,0 +1,41 @@
+import asyncio
+
+from strategy import CALLOUT_THRESHOLD, HeuristicStrategy, claim_bluff_probability
+
+
+def pov(hand: list[str], claimed: int, claimer_cards: int, current_rank: int) -> dict:
+    return {
+        "hand": hand,
+        "previous-player": "claimer",
+        "current_rank": current_rank,
+        "player_info": [{"name": "claimer", "last-discard": claimed, "cards": claimer_cards}],
+    }
+
+
+def should_callout(view: dict) -> bool:
+    return asyncio.run(HeuristicStrategy().should_callout(view))
+
+
+# Thirteen cards with no fives: the claimed rank below, when fives were due.
+HAND = ["C1", "C2", "C3", "C4", "C6", "C7", "C8", "C9", "D1", "D2", "D3", "D4", "D6"]
+
+
+def test_honest_two_card_claim_at_normal_hand_size_is_not_called():
+    # Two fives from a thirteen-card hand, now eleven: an ordinary honest play.
+    assert should_callout(pov(HAND, 2, 11, 6)) is False
+
+
+def test_honest_claims_are_not_presumed_bluffs_for_being_uncommon():
+    for claimed in range(1, 5):
+        assert claim_bluff_probability(claimed, 0, 13, 13 - claimed) < CALLOUT_THRESHOLD
+
+
+def test_claim_of_more_cards_than_are_left_is_called():
+    # We hold three fives, so two more can't be in their hand.
+    hand = ["C5", "D5", "H5", *HAND[3:]]
+    assert should_callout(pov(hand, 2, 11, 6)) is True
+
+
+def test_last_card_claim_is_probably_a_bluff():
+    # Going out on the one card left only works if it happens to be a five.
+    assert claim_bluff_probability(1, 0, 13, 0) > claim_bluff_probability(1, 0, 13, 12)
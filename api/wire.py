@@ -0,0 +1,77 @@
+import json
+from typing import Any
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional protocol
+    msgpack = None
+
+
+def dumps(message: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"))
+
+
+def loads(data: str | bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JsonCodec:
+    """Text frames of compact JSON, what the browser client speaks."""
+
+    name = "json"
+
+    def encode(self, message: Any) -> str:
+        return dumps(message)
+
+
+class MsgpackCodec:
+    """Binary frames of msgpack, smaller and cheaper to produce than JSON."""
+
+    name = "msgpack"
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+
+JSON = JsonCodec()
+MSGPACK = MsgpackCodec() if msgpack is not None else None
+
+
+def codec_for(name: str | None) -> JsonCodec | MsgpackCodec:
+    """The codec a client asked for with ?format=, JSON if it is unknown or unavailable."""
+    if name == "msgpack" and MSGPACK is not None:
+        return MSGPACK
+    return JSON
+
+
+async def send_frame(websocket: WebSocket, frame: str | bytes) -> None:
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+
+async def receive(websocket: WebSocket) -> Any:
+    """
+    Next message from a client, whichever format it arrives in: text frames
+    are JSON, binary frames msgpack.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is not None:
+        if msgpack is None:
+            raise ValueError("binary frames need msgpack installed")
+        return msgpack.unpackb(message["bytes"], raw=False)
+    return loads(message["text"])
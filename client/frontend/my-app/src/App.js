@@ -106,12 +106,26 @@ function GameScreen() {
       const data = JSON.parse(event.data);
       alert(`Server says: ${event.data}`);
 
-      if (data.hand) setPlayerHand(data.hand);
+      if (data.type === "delta") {
+        // Deltas only carry what changed since the last state message
+        const removed = new Set(data["hand-removed"] || []);
+        const added = data["hand-added"] || [];
+        if (removed.size || added.length)
+          setPlayerHand((prev) =>
+            prev.filter((c) => !removed.has(c)).concat(added)
+          );
+        if (Array.isArray(data.player_info)) {
+          const changed = new Map(data.player_info.map((p) => [p.name, p]));
+          setPlayerInfo((prev) => prev.map((p) => changed.get(p.name) || p));
+        }
+      } else {
+        if (data.hand) setPlayerHand(data.hand);
+        if (Array.isArray(data.player_info)) setPlayerInfo(data.player_info);
+      }
       if (typeof data["stack-size"] === "number")
         setStackSize(data["stack-size"]);
       if (typeof data["own-turn"] === "boolean") setOwnTurn(data["own-turn"]);
       if (typeof data.current_rank === "number") setLastRank(data.current_rank);
-      if (Array.isArray(data.player_info)) setPlayerInfo(data.player_info);
     };
 
     ws.current.addEventListener("message", handleMessage);
@@ -129,20 +143,14 @@ function GameScreen() {
     );
   };
 
-  const handlePlaySelectedCards = async () => {
+  const handlePlaySelectedCards = () => {
     if (selectedCards.length === 0) {
       alert("No cards selected!");
       return;
     }
 
-    try {
-      const response = await fetch(`/fer.txt?ts=${Date.now()}`);
-      const text = await response.text();
-
-      ws.current.send(JSON.stringify({ callout: selectedCards, data: text }));
-    } catch (err) {
-      console.error("Error reading file:", err);
-    }
+    // Emotion and speech data now reach the server from the vision client directly
+    ws.current.send(JSON.stringify({ discard: selectedCards }));
 
     setLastRank((prev) => (prev + 1 > 13 ? 1 : prev + 1));
     setOwnTurn(false); // setOwnTurn(false); true for testing
@@ -249,15 +257,8 @@ function CardStack({ stackSize }) {
 function ActionButton({ onPlaySelectedCards, ownTurn }) {
   const ws = useWebSocket();
 
-  const handleCallCheat = async () => {
-    try {
-      const response = await fetch(`/fer.txt?ts=${Date.now()}`);
-      const text = await response.text();
-
-      ws.current.send(JSON.stringify({ callout: true, data: text }));
-    } catch (err) {
-      console.error("Error reading file:", err);
-    }
+  const handleCallCheat = () => {
+    ws.current.send(JSON.stringify({ callout: true }));
   };
 
   return (
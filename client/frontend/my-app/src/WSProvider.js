@@ -2,17 +2,57 @@ import { createContext, useContext, useEffect, useRef } from "react";
 
 const WebSocketContext = createContext(null);
 
+const SERVER = "ws://localhost:8000/cheat";
+const SESSION_KEY = "cheat-session";
+const RECONNECT_DELAY = 1000;
+
+// Consumers get a stable wrapper rather than the socket itself, so their
+// listeners survive the socket being replaced after a dropped connection.
 export const WebSocketProvider = ({ children }) => {
   const ws = useRef(null);
 
   useEffect(() => {
-    ws.current = new WebSocket("ws://localhost:8000/cheat");
+    const listeners = new Set();
+    let socket;
+    let closed = false;
+    // A session only outlives a dropped connection, not a page load.
+    sessionStorage.removeItem(SESSION_KEY);
+
+    const connect = () => {
+      const session = sessionStorage.getItem(SESSION_KEY);
+      socket = new WebSocket(session ? `${SERVER}?session=${session}` : SERVER);
+
+      socket.onopen = () => console.log("Connected");
+      socket.onmessage = (e) => {
+        console.log("Message:", e.data);
+        const data = JSON.parse(e.data);
+        if (data.session) sessionStorage.setItem(SESSION_KEY, data.session);
+        listeners.forEach((listener) => listener(e));
+      };
+      socket.onclose = (e) => {
+        console.log("Closed");
+        // 1008: the server no longer knows this session.
+        if (e.code === 1008) sessionStorage.removeItem(SESSION_KEY);
+        if (!closed && sessionStorage.getItem(SESSION_KEY)) {
+          setTimeout(connect, RECONNECT_DELAY);
+        }
+      };
+    };
+    connect();
 
-    ws.current.onopen = () => console.log("Connected");
-    ws.current.onmessage = (e) => console.log("Message:", e.data);
-    ws.current.onclose = () => console.log("Closed");
+    ws.current = {
+      send: (data) => socket.send(data),
+      addEventListener: (type, listener) => {
+        if (type === "message") listeners.add(listener);
+      },
+      removeEventListener: (type, listener) => listeners.delete(listener),
+      close: () => socket.close(),
+    };
 
-    return () => ws.current?.close();
+    return () => {
+      closed = true;
+      socket.close();
+    };
   }, []);
 
   return (
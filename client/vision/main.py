@@ -1,34 +1,59 @@
 import cv2
 from deepface import DeepFace
 import threading
-from operator import itemgetter
 
 import queue
 import sounddevice as sd
 import vosk
 import json
+import os
+import time
 
-prev_dom = ""
+from models import VOSK_MODEL_PATH, StartupTimer, load_emotion_model, load_vosk_in_background
+from pipeline import LatestFrame, StageTimings, crop_face
+from telemetry import PLAYER_NAME, PLAYER_SESSION, TelemetryClient
+from tracking import FaceTracker
 
-emotion_list = ["", "", "", "", "", ""]
+# Everyone this camera sees, left to right, e.g. CHEAT_PLAYERS=alice,bob.
+PLAYERS = [name for name in os.getenv("CHEAT_PLAYERS", PLAYER_NAME).split(",") if name]
+# Their session tokens, in the same order, e.g. CHEAT_SESSIONS=<alice's>,<bob's>.
+SESSIONS = [token for token in os.getenv("CHEAT_SESSIONS", PLAYER_SESSION).split(",") if token]
+if len(SESSIONS) != len(PLAYERS):
+    raise SystemExit("Set CHEAT_SESSIONS to one session token per player in CHEAT_PLAYERS")
 
-def enew(new_emotion):
-    emotion_list[4] = emotion_list[3]
-    emotion_list[3] = emotion_list[2]
-    emotion_list[2] = emotion_list[1]
-    emotion_list[1] = emotion_list[0]
-    emotion_list[0] = new_emotion
+startup = StartupTimer()
+telemetry_clients = {name: TelemetryClient(session) for name, session in zip(PLAYERS, SESSIONS)}
+# There is one microphone, so speech is credited to the first player.
+telemetry = telemetry_clients[PLAYERS[0]]
+vosk_model = load_vosk_in_background(startup)
 
+# Order of the scores in each emotion sample; the server expects the same.
+EMOTIONS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+
+# Send in-progress recognition as it changes instead of waiting for the end of
+# the utterance. Smaller audio blocks mean partials arrive sooner.
+STREAM_PARTIAL_SPEECH = True
+VOICE_BLOCK_SIZE = 4000 if STREAM_PARTIAL_SPEECH else 8000
+
+
+def timed_words(words, stream_start):
+    """Vosk word entries with start/end converted to wall-clock seconds."""
+    return [
+        {"word": w["word"], "start": stream_start + w["start"], "end": stream_start + w["end"]}
+        for w in words
+    ]
 
-def voice():
-    model_path = "vosk-model-en-us-0.22"
 
+def voice():
     try:
-        model = vosk.Model(model_path)
+        # Loading started at launch, this only waits for it to finish.
+        model = vosk_model.result()
     except Exception as e:
-        print(f"Error loading Vosk model at '{model_path}': {e}")
+        print(f"Error loading Vosk model at '{VOSK_MODEL_PATH}': {e}")
         print("Vosk thread terminated.")
         return
+    startup.report("vosk ready")
 
     audio_queue = queue.Queue()
 
@@ -51,29 +76,41 @@ def voice():
         return
 
     try:
-        with sd.RawInputStream(device=dindex, channels=1, samplerate=sample_rate, blocksize=8000, dtype='int16',
-                               callback=audio_callback):
+        with sd.RawInputStream(device=dindex, channels=1, samplerate=sample_rate, blocksize=VOICE_BLOCK_SIZE,
+                               dtype='int16', callback=audio_callback):
             print("Vosk: Listening... (Voice thread started)")
             recognizer = vosk.KaldiRecognizer(model, sample_rate)
+            recognizer.SetWords(True)
+            if STREAM_PARTIAL_SPEECH:
+                recognizer.SetPartialWords(True)
+
+            # Vosk times words from the start of the stream; anchor that to the
+            # wall clock so the server can line speech up with game turns.
+            stream_start = None
+            utterance = 0
+            last_partial = ""
 
             while True:
-                data = audio_queue.get() 
+                data = audio_queue.get()
+                if stream_start is None:
+                    stream_start = time.time() - len(data) / 2 / sample_rate
 
                 if recognizer.AcceptWaveform(data):
-                    result = recognizer.Result()
-                    result_dict = json.loads(result)
+                    result_dict = json.loads(recognizer.Result())
                     rec_text = result_dict.get('text', '')
-                    emotion_list[5] = str(rec_text)
-                    try:
-                        with open('../frontend/my-app/public/fer.txt', 'w') as file:
-                            for i in emotion_list:
-                                file.write( str(i) + "\n")
-                    except Exception as e:
-                        print(e)
-
-                #else:
-                #    partial_result = recognizer.PartialResult()
-                #    partial_result_dict = json.loads(partial_result)
+                    if rec_text:
+                        words = timed_words(result_dict.get('result', []), stream_start)
+                        telemetry.send("speech", utterance=utterance, text=rec_text, words=words)
+                    utterance += 1
+                    last_partial = ""
+
+                elif STREAM_PARTIAL_SPEECH:
+                    partial_dict = json.loads(recognizer.PartialResult())
+                    partial_text = partial_dict.get('partial', '')
+                    if partial_text and partial_text != last_partial:
+                        words = timed_words(partial_dict.get('partial_result', []), stream_start)
+                        telemetry.send("speech-partial", utterance=utterance, text=partial_text, words=words)
+                        last_partial = partial_text
 
     except Exception as e:
         print(f"Vosk Thread Error: {e}")
@@ -83,45 +120,91 @@ voice_thread = threading.Thread(target=voice, daemon=True)
 voice_thread.start()
 print("Voice recognition thread started.")
 
-FRAME_SKIP = 1
-frame_count = 0
-
-current_frame = None
+# Analysis runs at most this often; frames captured in between are dropped.
+TARGET_ANALYSIS_FPS = 5
+# Face detection runs on a copy of the frame scaled down to this width.
+DETECT_WIDTH = 480
+# Cropped faces are resized to this square before emotion classification.
+FACE_SIZE = 224
+FACE_MARGIN = 0.15
+# Full face detection runs on every Nth analysed frame, faces are tracked in between.
+DETECT_EVERY = 5
+
+load_emotion_model(startup, FACE_SIZE)
+
+frame_slot = LatestFrame()
+timings = StageTimings()
+tracker = FaceTracker(PLAYERS, DETECT_WIDTH, DETECT_EVERY)
 latest_results = None
 analysis_lock = threading.Lock()
 
 print("Starting real-time Facial Expression Recognition...")
 
 def analyze_worker():
-    global latest_results, current_frame
+    global latest_results
+
+    min_interval = 1.0 / TARGET_ANALYSIS_FPS
 
     while True:
-        frame_to_analyze = current_frame 
-        
-        if frame_to_analyze is not None:
-            try:
-                results = DeepFace.analyze(
-                    img_path=frame_to_analyze,
+        frame_to_analyze, captured_at = frame_slot.get()
+        started = time.monotonic()
+        timings.record("queue", started - captured_at)
+
+        try:
+            tracks, detected_faces = tracker.update(frame_to_analyze)
+            located = time.monotonic()
+            timings.record("detect" if detected_faces else "track", located - started)
+
+            results = []
+            captured_wall = time.time() - (time.monotonic() - captured_at)
+            for track in tracks:
+                face = crop_face(frame_to_analyze, track.box, FACE_MARGIN, FACE_SIZE)
+                # The face is already located, so skip DeepFace's own detector.
+                result = DeepFace.analyze(
+                    img_path=face,
                     actions=['emotion'],
                     enforce_detection=False,
-                    detector_backend='opencv' 
-                )
-                
-                with analysis_lock:
-                    latest_results = results
-                    
-            except Exception as e:
-                with analysis_lock:
-                    latest_results = None 
-
-cap = cv2.VideoCapture(0)
-
-cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920) 
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+                    detector_backend='skip'
+                )[0]
+                x, y, w, h = track.box
+                result['region'] = {'x': x, 'y': y, 'w': w, 'h': h}
+                result['face_confidence'] = track.confidence
+                result['player'] = track.player
+                results.append(result)
+
+                if track.player is not None:
+                    # Raw scores only, the server keeps each player's history and derives features.
+                    telemetry_clients[track.player].send(
+                        "emotion",
+                        t=captured_wall,
+                        scores=[float(result['emotion'][e]) / 100 for e in EMOTIONS],
+                        confidence=float(result['face_confidence'])
+                    )
+            timings.record("classify", time.monotonic() - located)
+
+            with analysis_lock:
+                latest_results = results
+
+        except Exception as e:
+            with analysis_lock:
+                latest_results = None
+
+        finished = time.monotonic()
+        timings.record("total", finished - started)
+        timings.maybe_report(f" | dropped {frame_slot.dropped}/{frame_slot.sequence} frames")
+
+        time.sleep(max(0.0, min_interval - (finished - started)))
+
+with startup.phase("camera"):
+    cap = cv2.VideoCapture(0)
+
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920) 
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 
 if not cap.isOpened():
     print("Error: Could not open webcam.")
     exit()
+startup.report()
 
 analysis_thread = threading.Thread(target=analyze_worker, daemon=True)
 analysis_thread.start()
@@ -135,10 +218,8 @@ while True:
         print("Error: Could not read frame.")
         break
 
-    frame_count += 1
-    if frame_count % FRAME_SKIP == 0:
-        current_frame = frame.copy() 
-        frame_count = 0
+    # Copied because the overlay below is drawn onto this frame.
+    frame_slot.put(frame.copy())
 
     with analysis_lock:
         results_to_draw = latest_results
@@ -147,38 +228,6 @@ while True:
         for result in results_to_draw:
             dominant_emotion = result['dominant_emotion'].upper()
 
-            if result['face_confidence'] > 0.49 and result['dominant_emotion'] != prev_dom:
-                es = result['emotion']
-
-                emotion_scores_list1 = [
-                    ["angry", es['angry']],
-                    ["disgust", es['disgust']],
-                    ["fear", es['fear']],
-                    ["happy", es['happy']],
-                    ["sad", es['sad']],
-                    ["suprise", es['surprise']],
-                    ["neutral", es['neutral']]
-                ]
-
-                emotion_string = ""
-
-                emotion_scores_list = sorted(emotion_scores_list1, key=itemgetter(1))
-
-                for i in emotion_scores_list:
-                    if i[1] > 10:
-                        emotion_string += str(i[0] + "(" + str(int(i[1])) + "%) " )
-
-                enew(emotion_string)
-
-                try:
-                    with open('../frontend/my-app/public/fer.txt', 'w') as file:
-                        for i in emotion_list:
-                            file.write( str(i) + "\n")
-                except Exception as e:
-                    print(e)
-
-                prev_dom = result['dominant_emotion']
-            
             region = result['region']
             x, y, w, h = region['x'], region['y'], region['w'], region['h']
             
@@ -187,7 +236,7 @@ while True:
                 color = (0, 0, 255)
 
             cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-            text = f"Emotion: {dominant_emotion}"
+            text = f"{result['player'] or '?'}: {dominant_emotion}"
             cv2.putText(frame, text, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 
                         0.9, color, 2, cv2.LINE_AA)
 
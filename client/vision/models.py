@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import vosk
+from deepface import DeepFace
+
+from pipeline import detect_faces
+
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "vosk-model-en-us-0.22")
+
+
+class StartupTimer:
+    """Records how long each startup phase took, including ones on other threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append((name, time.monotonic() - started))
+
+    def report(self, title="startup"):
+        with self.lock:
+            parts = [f"{name} {seconds:.2f}s" for name, seconds in self.phases]
+        print(f"[{title}] " + " | ".join(parts) + f" | since launch {time.monotonic() - self.started:.2f}s")
+
+
+def prefetch(path):
+    """
+    Asks the OS to start reading a model's files into the page cache so the
+    loader that follows mostly hits memory. A no-op where fadvise isn't available.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+
+
+def load_vosk(timer, path=VOSK_MODEL_PATH):
+    with timer.phase("vosk prefetch"):
+        prefetch(path)
+    with timer.phase("vosk load"):
+        return vosk.Model(path)
+
+
+def load_vosk_in_background(timer, path=VOSK_MODEL_PATH):
+    """Starts loading the (large) Vosk model on its own thread and returns a future."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vosk-loader")
+    future = executor.submit(load_vosk, timer, path)
+    executor.shutdown(wait=False)
+    return future
+
+
+def load_emotion_model(timer, face_size):
+    """
+    Builds DeepFace's emotion model once (DeepFace keeps it cached for later
+    analyze calls) and runs a dummy face and frame through the classifier and
+    detector so the first real frame doesn't pay for graph setup.
+    """
+    with timer.phase("emotion model"):
+        DeepFace.build_model(model_name="Emotion", task="facial_attribute")
+    with timer.phase("warm-up"):
+        dummy_face = np.zeros((face_size, face_size, 3), dtype=np.uint8)
+        DeepFace.analyze(
+            img_path=dummy_face,
+            actions=['emotion'],
+            enforce_detection=False,
+            detector_backend='skip'
+        )
+        detect_faces(np.zeros((480, 640, 3), dtype=np.uint8), 480)
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import cv2
+
+
+class LatestFrame:
+    """
+    Single-slot hand-off between the capture loop and the analysis thread.
+    A new frame overwrites one that hasn't been picked up yet, so analysis
+    always works on the freshest frame and never builds a backlog.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.captured_at = 0.0
+        self.sequence = 0
+        self.dropped = 0
+        self.taken = 0
+
+    def put(self, frame):
+        with self.condition:
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = frame
+            self.captured_at = time.monotonic()
+            self.sequence += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Blocks until there is a frame that hasn't been taken yet."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.frame is not None, timeout):
+                return None, 0.0
+            frame, captured_at = self.frame, self.captured_at
+            self.frame = None
+            self.taken += 1
+            return frame, captured_at
+
+
+class StageTimings:
+    """Rolling per-stage timings, printed every `interval` seconds."""
+
+    def __init__(self, interval=5.0):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.counts = {}
+        self.last_report = time.monotonic()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def maybe_report(self, extra=""):
+        now = time.monotonic()
+        if now - self.last_report < self.interval:
+            return
+        with self.lock:
+            parts = [
+                f"{stage} {self.totals[stage] / self.counts[stage] * 1000:.1f}ms"
+                for stage in self.totals
+            ]
+            frames = self.counts.get("total", 0)
+            fps = frames / (now - self.last_report)
+            self.totals.clear()
+            self.counts.clear()
+            self.last_report = now
+        print(f"[vision] {fps:.1f} analyses/s | " + " | ".join(parts) + extra)
+
+
+face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+
+
+def detect_faces(frame, width):
+    """
+    Finds faces on a grayscale copy of the frame scaled down to `width`
+    pixels wide, returning ((x, y, w, h), confidence) pairs with boxes in
+    full-frame coordinates.
+    """
+    scale = min(1.0, width / frame.shape[1])
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    boxes, _, weights = face_cascade.detectMultiScale3(
+        gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30), outputRejectLevels=True
+    )
+    return [
+        (tuple(int(v / scale) for v in box), detection_confidence(float(weight)))
+        for box, weight in zip(boxes, weights)
+    ]
+
+
+def detection_confidence(weight):
+    """
+    Haar cascade weights are above 0 but have no upper bound. This maps them
+    into 0-1, with a weight of 1 (a borderline face) at 0.5.
+    """
+    return max(0.0, weight) / (max(0.0, weight) + 1.0)
+
+
+def crop_face(frame, box, margin, size):
+    """Cuts the face out with some margin and resizes it for the classifier."""
+    x, y, w, h = box
+    dx, dy = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(frame.shape[1], x + w + dx), min(frame.shape[0], y + h + dy)
+    return cv2.resize(frame[y0:y1, x0:x1], (size, size), interpolation=cv2.INTER_AREA)
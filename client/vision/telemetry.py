@@ -0,0 +1,61 @@
+import json
+import os
+import queue
+import threading
+import time
+from urllib.parse import quote
+
+from websockets.sync.client import connect
+
+TELEMETRY_URL = os.getenv("CHEAT_TELEMETRY_URL", "ws://localhost:8000/telemetry")
+PLAYER_NAME = os.getenv("CHEAT_PLAYER", "player")
+# The session token the server gave the player's game client when they joined.
+PLAYER_SESSION = os.getenv("CHEAT_SESSION", "")
+# Samples waiting to be sent; the oldest are dropped if the server is unreachable.
+MAX_PENDING = 256
+RECONNECT_DELAY = 2.0
+
+
+class TelemetryClient:
+    """
+    Pushes timestamped emotion and speech samples to the game server over a
+    websocket. send() never blocks the caller; a background thread batches
+    whatever is queued into one message and reconnects if the server goes away.
+    """
+
+    def __init__(self, session=PLAYER_SESSION, url=TELEMETRY_URL):
+        self.url = f"{url}?session={quote(session)}"
+        self.pending = queue.Queue(maxsize=MAX_PENDING)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, kind, t=None, **fields):
+        sample = {"kind": kind, "t": time.time() if t is None else t, **fields}
+        while True:
+            try:
+                self.pending.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self.pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def drain(self):
+        batch = [self.pending.get()]
+        while True:
+            try:
+                batch.append(self.pending.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def run(self):
+        while True:
+            try:
+                with connect(self.url) as websocket:
+                    print(f"Telemetry: connected to {self.url}")
+                    while True:
+                        websocket.send(json.dumps(self.drain()))
+            except Exception as e:
+                print(f"Telemetry: {e}, retrying in {RECONNECT_DELAY}s")
+                time.sleep(RECONNECT_DELAY)
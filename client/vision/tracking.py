@@ -0,0 +1,124 @@
+import cv2
+
+from pipeline import detect_faces
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union else 0.0
+
+
+def centre(box):
+    x, y, w, h = box
+    return x + w / 2, y + h / 2
+
+
+class Track:
+    def __init__(self, track_id, box, template, confidence):
+        self.id = track_id
+        self.box = box
+        self.template = template
+        # How sure we are the box holds the face: the detector's score, or the
+        # template match score on frames where the track was only followed.
+        self.confidence = confidence
+        self.missed = 0
+        self.player = None
+
+
+class FaceTracker:
+    """
+    Follows several faces across frames. The face detector only runs every
+    `detect_every` frames; detections are matched to existing tracks by IoU
+    (falling back to centre distance), and in between each track is moved by
+    template matching in a small area around where it was.
+
+    Each track is bound to a player name: new faces take the free seat that
+    matches their left-to-right position in the frame.
+    """
+
+    def __init__(self, players, detect_width, detect_every=5, iou_threshold=0.3, max_missed=3):
+        self.players = list(players)
+        self.detect_width = detect_width
+        self.detect_every = detect_every
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.tracks = []
+        self.next_id = 0
+        self.frames = 0
+
+    def update(self, frame):
+        """Returns the live tracks for this frame and whether detection ran."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        detect = self.frames % self.detect_every == 0 or not self.tracks
+        self.frames += 1
+        if detect:
+            self.associate(detect_faces(frame, self.detect_width), gray)
+        else:
+            for track in self.tracks:
+                self.follow(track, gray)
+        return self.tracks, detect
+
+    def associate(self, detections, gray):
+        unmatched = list(detections)
+        for track in self.tracks:
+            best = max(unmatched, key=lambda found: iou(track.box, found[0]), default=None)
+            if best is not None and iou(track.box, best[0]) < self.iou_threshold:
+                # Fast movement can leave no overlap; accept the nearest face
+                # if its centre is within one face width of the track's.
+                nearest = min(unmatched, key=lambda found: self.distance(track.box, found[0]))
+                best = nearest if self.distance(track.box, nearest[0]) < track.box[2] else None
+            if best is None:
+                track.missed += 1
+                track.confidence = 0.0
+                continue
+            unmatched.remove(best)
+            track.box, track.confidence = best
+            track.template = self.crop(gray, track.box)
+            track.missed = 0
+
+        for track in [t for t in self.tracks if t.missed > self.max_missed]:
+            self.tracks.remove(track)
+
+        for box, confidence in unmatched:
+            track = Track(self.next_id, box, self.crop(gray, box), confidence)
+            self.next_id += 1
+            track.player = self.seat(box, gray.shape[1])
+            self.tracks.append(track)
+
+    def follow(self, track, gray):
+        x, y, w, h = track.box
+        pad_x, pad_y = w // 2, h // 2
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(gray.shape[1], x + w + pad_x), min(gray.shape[0], y + h + pad_y)
+        area = gray[y0:y1, x0:x1]
+        if area.shape[0] < h or area.shape[1] < w:
+            track.confidence = 0.0
+            return
+        scores = cv2.matchTemplate(area, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(scores)
+        track.confidence = max(0.0, float(score))
+        if score > 0.5:
+            track.box = (x0 + mx, y0 + my, w, h)
+
+    def seat(self, box, width):
+        taken = {t.player for t in self.tracks}
+        free = [i for i, name in enumerate(self.players) if name not in taken]
+        if not free:
+            return None
+        position = centre(box)[0] / width * len(self.players)
+        return self.players[min(free, key=lambda i: abs(i + 0.5 - position))]
+
+    @staticmethod
+    def distance(a, b):
+        (ax, ay), (bx, by) = centre(a), centre(b)
+        return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+    @staticmethod
+    def crop(gray, box):
+        x, y, w, h = box
+        return gray[y:y + h, x:x + w].copy()